@@ -3,17 +3,82 @@ Azure AI Image Analyzer - Generalized Image Analysis with Flexible Configuration
 Supports both Azure Key Vault and local credential file authentication
 """
 
+import io
 import json
+import orjson
+import queue
 import requests
 import os
 import random
+import re
+import shutil
 import string
-from datetime import datetime
+import threading
+import tempfile
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+from functools import cached_property, lru_cache
 from pathlib import Path
-from typing import Dict, List, Optional, Any
-from azure.storage.blob import BlobServiceClient
+from typing import Dict, List, Optional, Any, Union
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from azure.core.exceptions import ClientAuthenticationError, ResourceNotFoundError
+from azure.storage.blob import BlobServiceClient, BlobSasPermissions, ContentSettings, StandardBlobTier, generate_blob_sas
 from azure.keyvault.secrets import SecretClient
-from azure.identity import DefaultAzureCredential, ManagedIdentityCredential, AzureCliCredential, ChainedTokenCredential
+from azure.identity import DefaultAzureCredential
+
+# Supported image file extensions, matched case-insensitively against blob and file names
+_IMAGE_RE = re.compile(r'\.(?:jpe?g|png|bmp|tiff?|gif)$', re.IGNORECASE)
+
+# Key Vault secrets cached locally between runs (owner read/write only)
+SECRET_CACHE_FILE = Path.home() / ".cache" / "azure_ai_analyzer" / "secrets.json"
+SECRET_CACHE_TTL = int(os.getenv("SECRET_CACHE_TTL", "0"))  # seconds; off unless set
+KEYVAULT_SECRET_NAMES = ("storage-connection-string", "vision-endpoint", "vision-key")
+
+# Request headers for posting raw image bytes to Vision
+_OCTET_STREAM_HEADERS = {'Content-Type': 'application/octet-stream'}
+
+# Blob batch requests accept at most 256 sub-requests
+BLOB_BATCH_SIZE = 256
+
+# Results-container blob mapping each analyzed image to its ETag and last result
+ANALYSIS_INDEX_BLOB = "analysis_index.json"
+
+# Fields a reused index entry's result must have to stand in for a fresh analysis
+_INDEXED_RESULT_KEYS = frozenset({'filename', 'caption', 'confidence', 'tags', 'objects', 'target_objects_detected'})
+
+# Local file naming the newest image_analysis_results_*.json, read by web_interface.py
+LATEST_RESULTS_POINTER = "image_analysis_results_latest.txt"
+
+
+def _is_image_url_error(response: requests.Response) -> bool:
+    """Whether a Vision error reply says it could not download the image URL"""
+    if response.status_code != 400:
+        return False
+    try:
+        error = orjson.loads(response.content)["error"]
+        inner = error.get("innererror") or error.get("innerError") or {}
+        codes = (str(error.get("code", "")).lower(), str(inner.get("code", "")).lower())
+    except (orjson.JSONDecodeError, TypeError, KeyError, AttributeError):
+        return False
+    return "invalidimageurl" in codes
+
+
+@lru_cache(maxsize=None)
+def get_azure_credential() -> DefaultAzureCredential:
+    """
+    Process-wide Azure credential shared by every client
+    
+    DefaultAzureCredential already tries managed identity and the Azure CLI,
+    and sharing one instance lets every client reuse its in-memory token cache.
+    """
+    return DefaultAzureCredential(
+        exclude_interactive_browser_credential=True,
+        exclude_visual_studio_code_credential=True
+    )
+
 
 class AzureAIImageAnalyzer:
     def __init__(self, credential_method: str = "keyvault", key_vault_url: str = None, config_file: str = "config.json"):
@@ -25,26 +90,46 @@ class AzureAIImageAnalyzer:
             key_vault_url: Azure Key Vault URL (required if using keyvault method)
             config_file: Path to configuration file
         """
+        if credential_method not in ("keyvault", "local"):
+            raise ValueError("credential_method must be 'keyvault' or 'local'")
+        if credential_method == "keyvault" and not key_vault_url:
+            raise ValueError("key_vault_url is required when using keyvault credential method")
+        
         self.credential_method = credential_method
         self.key_vault_url = key_vault_url
         self.results = []
         
         # Load configuration
         self.config = self._load_config(config_file)
+        self._keyword_re = self._compile_keyword_matcher(self.config["analysis_settings"]["target_keywords"])
         
-        # Initialize credentials based on method
-        if credential_method == "keyvault":
-            self._init_keyvault_credentials()
-        elif credential_method == "local":
-            self._init_local_credentials()
-        else:
-            raise ValueError("credential_method must be 'keyvault' or 'local'")
+        # Get container names from config
+        self.input_container_name = self.config["containers"]["input_container"]
+        self.results_container_name = self.config["containers"]["results_container"]
         
-        # Initialize Azure services
-        self._initialize_azure_services()
+        # Credentials, clients and containers are set up lazily on first use
+        self._containers_ready = False
+        
+        # Set when any Key Vault secret came from the local cache; a 401/403 then
+        # triggers one reload from Key Vault (guarded so worker threads reload once)
+        self._secrets_from_cache = False
+        self._secrets_reloaded = False
+        self._secret_reload_lock = threading.Lock()
+        
+        # Blob name -> ETag from the latest get_image_list() call
+        self._image_etags = {}
+        
+        # Vision query parameters depend only on config, so build them once
+        self._vision_params = {
+            'api-version': '2024-02-01',
+            'features': ','.join(self.config["analysis_settings"]["features"])
+        }
+        
+        # 'analyzed_at' stamp shared by every image in an analyze_all_images() run
+        self._run_started_iso = None
 
     def _load_config(self, config_file: str) -> Dict[str, Any]:
-        """Load configuration from JSON file"""
+        """Load configuration from JSON file, creating it with the defaults if it is missing"""
         try:
             if os.path.exists(config_file):
                 with open(config_file, 'r') as f:
@@ -58,7 +143,11 @@ class AzureAIImageAnalyzer:
                         "target_keywords": ["person", "car", "animal", "building"],
                         "confidence_threshold": 0.5,
                         "max_tags": 10,
-                        "features": ["caption", "tags", "objects"]
+                        "features": ["caption", "tags", "objects"],
+                        "concurrency": 8,
+                        "blob_parallelism": 4,
+                        "image_source": "url",
+                        "skip_unchanged": True
                     },
                     "containers": {
                         "input_container": "input-images",
@@ -80,26 +169,44 @@ class AzureAIImageAnalyzer:
             print(f"❌ Error loading configuration: {e}")
             raise
 
+    @staticmethod
+    def _compile_keyword_matcher(keywords: List[str]) -> Optional["re.Pattern"]:
+        """Compile target keywords into one case-insensitive alternation for substring matching"""
+        if not keywords:
+            return None
+        return re.compile("|".join(re.escape(keyword) for keyword in keywords), re.IGNORECASE)
+
     def _get_azure_credential(self):
-        """Get appropriate Azure credential based on environment"""
+        """Get the shared Azure credential"""
         try:
-            credentials = [
-                ManagedIdentityCredential(),
-                AzureCliCredential(),
-                DefaultAzureCredential()
-            ]
-            credential = ChainedTokenCredential(*credentials)
+            credential = get_azure_credential()
             print("✅ Azure credentials configured successfully")
             return credential
         except Exception as e:
             print(f"❌ Error setting up Azure credentials: {e}")
             raise
 
-    def _init_keyvault_credentials(self):
-        """Initialize credentials from Azure Key Vault"""
-        if not self.key_vault_url:
-            raise ValueError("key_vault_url is required when using keyvault credential method")
-        
+    @cached_property
+    def _credentials(self) -> Dict[str, str]:
+        """Load credentials with the configured method on first use"""
+        if self.credential_method == "keyvault":
+            return self._init_keyvault_credentials()
+        return self._init_local_credentials()
+
+    @property
+    def storage_connection_string(self) -> str:
+        return self._credentials["storage_connection_string"]
+
+    @property
+    def vision_endpoint(self) -> str:
+        return self._credentials["vision_endpoint"]
+
+    @property
+    def vision_key(self) -> str:
+        return self._credentials["vision_key"]
+
+    def _init_keyvault_credentials(self) -> Dict[str, str]:
+        """Load credentials from Azure Key Vault"""
         try:
             print("🔑 Connecting to Azure Key Vault...")
             self.credential = self._get_azure_credential()
@@ -109,23 +216,111 @@ class AzureAIImageAnalyzer:
                 credential=self.credential
             )
             
-            print("   📥 Loading storage-connection-string...")
-            self.storage_connection_string = self.key_vault_client.get_secret("storage-connection-string").value
-            
-            print("   📥 Loading vision-endpoint...")
-            self.vision_endpoint = self.key_vault_client.get_secret("vision-endpoint").value
-            
-            print("   📥 Loading vision-key...")
-            self.vision_key = self.key_vault_client.get_secret("vision-key").value
+            secrets = self._get_secrets_cached(KEYVAULT_SECRET_NAMES)
             
             print("✅ All secrets loaded successfully from Key Vault")
+            return {
+                "storage_connection_string": secrets["storage-connection-string"],
+                "vision_endpoint": secrets["vision-endpoint"].rstrip('/'),
+                "vision_key": secrets["vision-key"]
+            }
             
         except Exception as e:
             print(f"❌ Error loading secrets from Key Vault: {e}")
             raise
 
-    def _init_local_credentials(self):
-        """Initialize credentials from local file"""
+    def _get_secrets_cached(self, names, ttl: int = SECRET_CACHE_TTL) -> Dict[str, str]:
+        """Return Key Vault secrets, reading the local cache first and fetching misses in parallel"""
+        cache = self._read_secret_cache() if ttl > 0 else {}
+        now = time.time()
+        secrets = {}
+        missing = []
+        
+        for name in names:
+            entry = cache.get(f"{self.key_vault_url}|{name}")
+            if (isinstance(entry, dict) and isinstance(entry.get("value"), str)
+                    and isinstance(entry.get("cached_at"), (int, float)) and now - entry["cached_at"] < ttl):
+                print(f"   💾 Using cached {name}")
+                secrets[name] = entry["value"]
+            else:
+                missing.append(name)
+        self._secrets_from_cache = len(missing) < len(names)
+        
+        if missing:
+            print(f"   📥 Loading {', '.join(missing)}...")
+            with ThreadPoolExecutor(max_workers=len(missing)) as executor:
+                values = executor.map(lambda name: self.key_vault_client.get_secret(name).value, missing)
+                for name, value in zip(missing, values):
+                    secrets[name] = value
+                    cache[f"{self.key_vault_url}|{name}"] = {"value": value, "cached_at": now}
+            
+            if ttl > 0:
+                self._write_secret_cache(cache)
+        
+        return secrets
+
+    def _read_secret_cache(self) -> Dict[str, Any]:
+        """Read the local secret cache, treating any problem as an empty cache"""
+        try:
+            with open(SECRET_CACHE_FILE, 'r') as f:
+                cache = json.load(f)
+        except (OSError, ValueError):
+            return {}
+        return cache if isinstance(cache, dict) else {}
+
+    def _write_secret_cache(self, cache: Dict[str, Any]):
+        """Replace the local secret cache atomically, with owner-only permissions"""
+        try:
+            SECRET_CACHE_FILE.parent.mkdir(mode=0o700, parents=True, exist_ok=True)
+            # mkstemp creates the file 0600; os.replace means concurrent runs or a crash
+            # never leave a torn cache behind
+            fd, tmp_path = tempfile.mkstemp(dir=SECRET_CACHE_FILE.parent, prefix=".secrets.", suffix=".tmp")
+            try:
+                with os.fdopen(fd, 'w') as f:
+                    json.dump(cache, f)
+                os.replace(tmp_path, SECRET_CACHE_FILE)
+            except BaseException:
+                os.unlink(tmp_path)
+                raise
+        except OSError as e:
+            print(f"⚠️  Could not write secret cache: {e}")
+
+    def _reload_rejected_secrets(self) -> bool:
+        """
+        After a 401/403, drop cached Key Vault secrets and reload them from Key Vault
+        
+        Returns True when the credentials in use came from the local cache and have now
+        been replaced (by this or an earlier call), i.e. when a retry is worthwhile.
+        """
+        with self._secret_reload_lock:
+            if self._secrets_from_cache:
+                print("🔑 Cached secrets were rejected; reloading from Key Vault...")
+                cache = self._read_secret_cache()
+                prefix = f"{self.key_vault_url}|"
+                self._write_secret_cache({key: entry for key, entry in cache.items() if not key.startswith(prefix)})
+                
+                # Everything derived from the old secrets is rebuilt from the new ones
+                for name in ("_credentials", "blob_service_client", "_vision_url", "_can_sign_blob_urls"):
+                    self.__dict__.pop(name, None)
+                _ = self._credentials
+                self._secrets_from_cache = False
+                self._secrets_reloaded = True
+                # Worker threads share the session, so switch its key in place
+                if 'http' in self.__dict__:
+                    self.http.headers['Ocp-Apim-Subscription-Key'] = self.vision_key
+            return self._secrets_reloaded
+
+    def _retry_on_stale_secrets(self, call, *args, **kwargs):
+        """Run a Blob Storage call, retrying once with reloaded secrets if cached ones are rejected"""
+        try:
+            return call(*args, **kwargs)
+        except ClientAuthenticationError:
+            if not self._reload_rejected_secrets():
+                raise
+            return call(*args, **kwargs)
+
+    def _init_local_credentials(self) -> Dict[str, str]:
+        """Load credentials from local file"""
         creds_file = "creds.txt"
         
         if not os.path.exists(creds_file):
@@ -139,77 +334,103 @@ class AzureAIImageAnalyzer:
         try:
             print(f"🔑 Loading credentials from {creds_file}...")
             
-            credentials = {}
-            with open(creds_file, 'r') as f:
-                for line in f:
-                    line = line.strip()
-                    if line and '=' in line and not line.startswith('#'):
-                        key, value = line.split('=', 1)
-                        credentials[key.strip()] = value.strip()
-            
-            self.storage_connection_string = credentials.get('storage_connection_string')
-            self.vision_endpoint = credentials.get('vision_endpoint')
-            self.vision_key = credentials.get('vision_key')
-            
-            # Validate required credentials
-            missing_creds = []
-            if not self.storage_connection_string:
-                missing_creds.append('storage_connection_string')
-            if not self.vision_endpoint:
-                missing_creds.append('vision_endpoint')
-            if not self.vision_key:
-                missing_creds.append('vision_key')
+            # key=value lines; blank lines and # comments are ignored
+            pairs = (
+                line.split('=', 1)
+                for line in (raw.strip() for raw in Path(creds_file).read_text().splitlines())
+                if line and '=' in line and not line.startswith('#')
+            )
+            credentials = {key.strip(): value.strip() for key, value in pairs}
             
+            # Validate required credentials (empty values count as missing)
+            required = ('storage_connection_string', 'vision_endpoint', 'vision_key')
+            missing_creds = [key for key in required if not credentials.get(key)]
             if missing_creds:
                 raise ValueError(f"Missing required credentials: {', '.join(missing_creds)}")
             
             print("✅ All credentials loaded successfully from local file")
+            return {
+                "storage_connection_string": credentials['storage_connection_string'],
+                "vision_endpoint": credentials['vision_endpoint'].rstrip('/'),
+                "vision_key": credentials['vision_key']
+            }
             
         except Exception as e:
             print(f"❌ Error loading credentials from local file: {e}")
             raise
 
-    def _initialize_azure_services(self):
-        """Initialize Azure Blob Storage and AI Vision services"""
+    @cached_property
+    def blob_service_client(self) -> BlobServiceClient:
+        """Blob Storage client, created on first use"""
         try:
-            # Initialize Blob Storage client
-            self.blob_service_client = BlobServiceClient.from_connection_string(
-                self.storage_connection_string
-            )
-            
-            # Clean up endpoint URL
-            self.vision_endpoint = self.vision_endpoint.rstrip('/')
-            
-            # Get container names from config
-            self.input_container_name = self.config["containers"]["input_container"]
-            self.results_container_name = self.config["containers"]["results_container"]
-            
-            # Ensure containers exist
-            self._ensure_containers_exist()
-            
-            print("✅ Azure services initialized successfully")
-            
+            client = BlobServiceClient.from_connection_string(self.storage_connection_string)
+            print("✅ Azure Blob Storage client initialized")
+            return client
         except Exception as e:
-            print(f"❌ Error initializing Azure services: {e}")
+            print(f"❌ Error initializing Azure Blob Storage: {e}")
             raise
 
+    @cached_property
+    def _vision_url(self) -> str:
+        """Vision image analysis endpoint, resolved once credentials are loaded"""
+        return f"{self.vision_endpoint}/computervision/imageanalysis:analyze"
+
+    @cached_property
+    def http(self) -> requests.Session:
+        """Shared HTTP session so Vision calls reuse pooled keep-alive connections"""
+        return self._create_http_session()
+
+    def _create_http_session(self) -> requests.Session:
+        """Create a pooled HTTP session for Vision API calls with 429/5xx retries"""
+        retry = Retry(
+            total=5,
+            backoff_factor=0.3,
+            status_forcelist=[429, 500, 502, 503, 504],
+            allowed_methods=None  # Image analysis is idempotent, so POST is safe to retry
+        )
+        adapter = HTTPAdapter(pool_connections=32, pool_maxsize=32, max_retries=retry)
+        
+        session = requests.Session()
+        session.mount('https://', adapter)
+        session.headers.update({'Ocp-Apim-Subscription-Key': self.vision_key})
+        return session
+
+    def close(self):
+        """Release pooled HTTP connections"""
+        # Only close a session that was actually created
+        http = self.__dict__.get('http')
+        if http is not None:
+            http.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
     def _ensure_containers_exist(self):
-        """Create containers if they don't exist"""
+        """Create containers if they don't exist (checked once, before the first write)"""
+        if self._containers_ready:
+            return
+        
         containers = [self.input_container_name, self.results_container_name]
         
+        def ensure(container_name: str):
+            container_client = self.blob_service_client.get_container_client(container_name)
+            try:
+                container_client.get_container_properties()
+                print(f"✅ Container '{container_name}' already exists")
+            except ResourceNotFoundError:
+                container_client.create_container()
+                print(f"✅ Created container '{container_name}'")
+        
         for container_name in containers:
             try:
-                container_client = self.blob_service_client.get_container_client(container_name)
-                
-                try:
-                    container_client.get_container_properties()
-                    print(f"✅ Container '{container_name}' already exists")
-                except Exception:
-                    container_client.create_container()
-                    print(f"✅ Created container '{container_name}'")
-                    
+                self._retry_on_stale_secrets(ensure, container_name)
             except Exception as e:
                 print(f"⚠️  Warning: Could not ensure container '{container_name}' exists: {e}")
+        
+        self._containers_ready = True
 
     def upload_sample_images(self, images_folder: str = "images"):
         """Upload sample images from local folder to blob storage"""
@@ -218,46 +439,55 @@ class AzureAIImageAnalyzer:
             return
         
         try:
+            self._ensure_containers_exist()
             container_client = self.blob_service_client.get_container_client(self.input_container_name)
-            uploaded_count = 0
             
-            # Supported image extensions
-            image_extensions = ('.jpg', '.jpeg', '.png', '.bmp', '.tiff', '.gif')
+            # One listing call instead of a properties probe per file
+            existing_blobs = self._list_container_blobs(self.input_container_name)
             
+            to_upload = []
             for file_path in Path(images_folder).glob('*'):
-                if file_path.is_file() and file_path.suffix.lower() in image_extensions:
-                    blob_name = file_path.name
-                    
-                    # Check if blob already exists
-                    try:
-                        container_client.get_blob_client(blob_name).get_blob_properties()
-                        print(f"   📁 Skipping {blob_name} (already exists)")
-                        continue
-                    except:
-                        pass  # Blob doesn't exist, proceed to upload
-                    
-                    # Upload the file
+                if file_path.is_file() and _IMAGE_RE.search(file_path.name):
+                    if file_path.name in existing_blobs:
+                        print(f"   📁 Skipping {file_path.name} (already exists)")
+                    else:
+                        to_upload.append(file_path)
+            
+            def upload(file_path: Path) -> bool:
+                try:
                     with open(file_path, 'rb') as data:
-                        container_client.upload_blob(name=blob_name, data=data, overwrite=False)
-                        print(f"   📤 Uploaded {blob_name}")
-                        uploaded_count += 1
+                        container_client.upload_blob(name=file_path.name, data=data, overwrite=False)
+                    print(f"   📤 Uploaded {file_path.name}")
+                    return True
+                except Exception as e:
+                    print(f"   ⚠️  Failed to upload {file_path.name}: {e}")
+                    return False
+            
+            with ThreadPoolExecutor(max_workers=16) as executor:
+                uploaded_count = sum(executor.map(upload, to_upload))
             
             print(f"✅ Uploaded {uploaded_count} sample images to '{self.input_container_name}' container")
             
         except Exception as e:
             print(f"❌ Error uploading sample images: {e}")
 
+    def _list_container_blobs(self, container_name: str, name_starts_with: Optional[str] = None) -> Dict[str, str]:
+        """Return blob name -> ETag for a container, optionally filtered server-side by prefix"""
+        def list_blobs() -> Dict[str, str]:
+            container_client = self.blob_service_client.get_container_client(container_name)
+            # 5000 is the service maximum page size, minimizing continuation round trips
+            blobs = container_client.list_blobs(name_starts_with=name_starts_with or None, results_per_page=5000)
+            return {blob.name: blob.etag for blob in blobs}
+        
+        return self._retry_on_stale_secrets(list_blobs)
+
     def get_image_list(self) -> List[str]:
         """Get all image files from the input container"""
         try:
-            container_client = self.blob_service_client.get_container_client(self.input_container_name)
-            images = []
-            
-            image_extensions = ('.jpg', '.jpeg', '.png', '.bmp', '.tiff', '.gif')
-            
-            for blob in container_client.list_blobs():
-                if blob.name.lower().endswith(image_extensions):
-                    images.append(blob.name)
+            input_prefix = self.config["containers"].get("input_prefix", "")
+            blobs = self._list_container_blobs(self.input_container_name, input_prefix)
+            self._image_etags = {name: etag for name, etag in blobs.items() if _IMAGE_RE.search(name)}
+            images = sorted(self._image_etags)
             
             print(f"Found {len(images)} images in container '{self.input_container_name}'")
             return images
@@ -267,58 +497,185 @@ class AzureAIImageAnalyzer:
             return []
 
     def analyze_image_with_rest(self, blob_name: str) -> Optional[Dict[str, Any]]:
-        """Download and analyze a single image using REST API"""
+        """Analyze a single image using REST API, by SAS URL or by downloaded bytes"""
+        if self._use_image_urls():
+            return self._analyze_image_url(blob_name)
+        image_data = self._download_image(blob_name)
+        if image_data is None:
+            return None
+        return self._analyze_image_data(blob_name, image_data)
+
+    def _use_image_urls(self) -> bool:
+        """Whether Vision should fetch images itself from a SAS URL instead of receiving bytes"""
+        return self.config["analysis_settings"].get("image_source", "url") == "url" and self._can_sign_blob_urls
+
+    @cached_property
+    def _can_sign_blob_urls(self) -> bool:
+        """Whether the storage connection string carries an account key to sign SAS URLs with"""
+        if getattr(self.blob_service_client.credential, "account_key", None):
+            return True
+        print("ℹ️  Storage connection string has no account key; sending image bytes instead of SAS URLs")
+        return False
+
+    def _get_blob_sas_url(self, blob_name: str) -> str:
+        """Build a short-lived read-only SAS URL for an input blob"""
+        blob_client = self.blob_service_client.get_blob_client(
+            container=self.input_container_name,
+            blob=blob_name
+        )
+        # The client is built from a connection string, so sign with the account key
+        account_credential = self.blob_service_client.credential
+        sas_token = generate_blob_sas(
+            account_name=account_credential.account_name,
+            container_name=self.input_container_name,
+            blob_name=blob_name,
+            account_key=account_credential.account_key,
+            permission=BlobSasPermissions(read=True),
+            expiry=datetime.now(timezone.utc) + timedelta(minutes=10)
+        )
+        return f"{blob_client.url}?{sas_token}"
+
+    def _analyze_image_url(self, blob_name: str) -> Optional[Dict[str, Any]]:
+        """Let Vision read the image straight from blob storage, falling back to uploading bytes"""
+        try:
+            response = self._post_vision(json={'url': self._get_blob_sas_url(blob_name)})
+        except Exception as e:
+            print(f"Error analyzing {blob_name} by URL: {e}")
+            return None
+        
+        if _is_image_url_error(response):
+            # e.g. the storage account is not reachable from the Vision service; any
+            # other error is about the image itself and would fail the same way as bytes
+            print(f"   {blob_name}: Vision could not fetch the URL, retrying with image bytes")
+            image_data = self._download_image(blob_name)
+            if image_data is None:
+                return None
+            return self._analyze_image_data(blob_name, image_data)
+        return self._vision_result(blob_name, response)
+
+    def _download_image(self, blob_name: str) -> Optional[io.BytesIO]:
+        """Download one image from the input container into memory"""
         try:
-            # Download image
             blob_client = self.blob_service_client.get_blob_client(
                 container=self.input_container_name, 
                 blob=blob_name
             )
-            image_data = blob_client.download_blob().readall()
-            print(f"   Downloaded {len(image_data)} bytes")
-            
-            # Prepare REST API call
-            headers = {
-                'Ocp-Apim-Subscription-Key': self.vision_key,
-                'Content-Type': 'application/octet-stream'
-            }
+            # readinto() fills one buffer in place; readall() would copy it again via getvalue()
+            blob_parallelism = self.config["analysis_settings"].get("blob_parallelism", 4)
+            downloader = blob_client.download_blob(max_concurrency=blob_parallelism)
+            image_data = io.BytesIO()
+            downloader.readinto(image_data)
+            image_data.seek(0)
+            print(f"   {blob_name}: downloaded {downloader.size} bytes")
+            return image_data
             
-            # API endpoint for image analysis
-            url = f"{self.vision_endpoint}/computervision/imageanalysis:analyze"
-            
-            # Get features from config
-            features = ','.join(self.config["analysis_settings"]["features"])
-            
-            params = {
-                'api-version': '2024-02-01',
-                'features': features
-            }
-            
-            # Make API call
-            response = requests.post(url, headers=headers, params=params, data=image_data)
-            
-            if response.status_code == 200:
-                result = response.json()
-                print(f"   API call successful")
-                return self.process_api_response(result, blob_name)
-            else:
-                print(f"   API error {response.status_code}: {response.text}")
-                return None
-                
+        except Exception as e:
+            print(f"Error downloading {blob_name}: {e}")
+            return None
+
+    def _analyze_image_data(self, blob_name: str, image_data: io.BytesIO) -> Optional[Dict[str, Any]]:
+        """Send downloaded image bytes to the Vision REST API"""
+        try:
+            return self._call_vision(blob_name, headers=_OCTET_STREAM_HEADERS, data=image_data)
         except Exception as e:
             print(f"Error analyzing {blob_name}: {e}")
             return None
 
+    def _call_vision(self, blob_name: str, **body) -> Optional[Dict[str, Any]]:
+        """POST one image (bytes or URL body) to the Vision analyze endpoint and process the reply"""
+        return self._vision_result(blob_name, self._post_vision(**body))
+
+    def _post_vision(self, **body) -> requests.Response:
+        """POST one image (bytes or URL body) to the Vision analyze endpoint"""
+        # URL and params are precomputed; the subscription key is set on the session
+        response = self.http.post(self._vision_url, params=self._vision_params, timeout=(5, 30), **body)
+        if response.status_code in (401, 403) and self._reload_rejected_secrets():
+            # The cached Vision key was rotated; retry once with the one now in Key Vault
+            if hasattr(body.get('data'), 'seek'):
+                body['data'].seek(0)
+            response = self.http.post(self._vision_url, params=self._vision_params, timeout=(5, 30), **body)
+        return response
+
+    def _vision_result(self, blob_name: str, response: requests.Response) -> Optional[Dict[str, Any]]:
+        """Processed analysis for a successful Vision reply, None (after reporting it) otherwise"""
+        if response.status_code == 200:
+            result = orjson.loads(response.content)
+            print(f"   {blob_name}: API call successful")
+            return self.process_api_response(result, blob_name)
+        else:
+            print(f"   {blob_name}: API error {response.status_code}: {response.text}")
+            return None
+
+    def _run_analysis_pipeline(self, images: List[str]) -> Dict[str, Optional[Dict[str, Any]]]:
+        """
+        Analyze images with separate download and analysis worker pools
+        
+        In URL mode images are analyzed directly from SAS URLs instead.
+        Otherwise downloaders push (name, bytes) onto a bounded queue that analyzers drain,
+        so blob downloads overlap Vision calls while buffered images stay capped.
+        """
+        settings = self.config["analysis_settings"]
+        analyze_workers = settings.get("concurrency", 8)
+        
+        if self._use_image_urls():
+            # Vision fetches the blobs itself, so there is no download stage
+            with ThreadPoolExecutor(max_workers=analyze_workers) as executor:
+                return dict(zip(images, executor.map(self._analyze_image_url, images)))
+        
+        download_workers = settings.get("download_concurrency", analyze_workers)
+        
+        pending = queue.Queue()
+        for name in images:
+            pending.put(name)
+        downloaded = queue.Queue(maxsize=settings.get("max_buffered_images", 32))
+        results = {}
+        
+        def download_worker():
+            while True:
+                try:
+                    name = pending.get_nowait()
+                except queue.Empty:
+                    return
+                downloaded.put((name, self._download_image(name)))
+        
+        def analyze_worker():
+            while True:
+                item = downloaded.get()
+                if item is None:
+                    return
+                name, image_data = item
+                # Never let an analyzer die: downloaders block on the bounded queue,
+                # so the run would hang once every analyzer was gone
+                try:
+                    results[name] = None if image_data is None else self._analyze_image_data(name, image_data)
+                except Exception as e:
+                    print(f"Error analyzing {name}: {e}")
+                    results[name] = None
+        
+        with ThreadPoolExecutor(max_workers=download_workers) as download_pool, \
+                ThreadPoolExecutor(max_workers=analyze_workers) as analyze_pool:
+            analyzers = [analyze_pool.submit(analyze_worker) for _ in range(analyze_workers)]
+            try:
+                for future in [download_pool.submit(download_worker) for _ in range(download_workers)]:
+                    future.result()
+            finally:
+                # One sentinel per analyzer once every download has been queued
+                for _ in analyzers:
+                    downloaded.put(None)
+            for future in analyzers:
+                future.result()
+        
+        return results
+
     def process_api_response(self, result: Dict[str, Any], blob_name: str) -> Dict[str, Any]:
         """Process the API response into our format"""
         settings = self.config["analysis_settings"]
-        target_keywords = settings["target_keywords"]
         confidence_threshold = settings["confidence_threshold"]
         max_tags = settings["max_tags"]
         
         analysis = {
             'filename': blob_name,
-            'analyzed_at': datetime.now().isoformat(),
+            'analyzed_at': self._run_started_iso or datetime.now().isoformat(),
             'caption': "No description",
             'confidence': 0,
             'tags': [],
@@ -332,50 +689,36 @@ class AzureAIImageAnalyzer:
             analysis['caption'] = caption_data.get('text', 'No description')
             analysis['confidence'] = round(caption_data.get('confidence', 0), 2)
         
-        # Extract tags
-        if 'tagsResult' in result and 'values' in result['tagsResult']:
-            for tag in result['tagsResult']['values'][:max_tags]:
-                if tag['confidence'] >= confidence_threshold:
+        # Extract tags and objects in a single pass each, collecting the
+        # above-threshold names for keyword matching as we go
+        all_terms = []
+        
+        for i, tag in enumerate((result.get('tagsResult') or {}).get('values', ())):
+            if tag['confidence'] >= confidence_threshold:
+                all_terms.append(tag['name'])
+                if i < max_tags:
                     analysis['tags'].append({
                         'name': tag['name'],
                         'confidence': round(tag['confidence'], 2)
                     })
         
-        # Extract objects
-        if 'objectsResult' in result and 'values' in result['objectsResult']:
-            for obj in result['objectsResult']['values']:
-                if 'tags' in obj and obj['tags']:
-                    obj_confidence = obj['tags'][0]['confidence']
-                    if obj_confidence >= confidence_threshold:
-                        analysis['objects'].append({
-                            'object': obj['tags'][0]['name'],
-                            'confidence': round(obj_confidence, 2),
-                            'bounding_box': obj.get('boundingBox', {})
-                        })
-        
-        # Look for target keywords
-        all_terms = []
+        for obj in (result.get('objectsResult') or {}).get('values', ()):
+            if obj.get('tags') and obj['tags'][0]['confidence'] >= confidence_threshold:
+                top = obj['tags'][0]
+                all_terms.append(top['name'])
+                analysis['objects'].append({
+                    'object': top['name'],
+                    'confidence': round(top['confidence'], 2),
+                    'bounding_box': obj.get('boundingBox', {})
+                })
+        
+        # Find target keyword matches (dict keys keep first-seen order without duplicates)
+        if self._keyword_re is not None:
+            search = self._keyword_re.search
+            detected = dict.fromkeys(term for term in all_terms if search(term))
+            analysis['target_objects_detected'] = list(detected)
         
-        # Add tag names
-        if 'tagsResult' in result and 'values' in result['tagsResult']:
-            all_terms.extend([tag['name'] for tag in result['tagsResult']['values'] 
-                             if tag['confidence'] >= confidence_threshold])
-        
-        # Add object names
-        if 'objectsResult' in result and 'values' in result['objectsResult']:
-            for obj in result['objectsResult']['values']:
-                if 'tags' in obj and obj['tags']:
-                    if obj['tags'][0]['confidence'] >= confidence_threshold:
-                        all_terms.append(obj['tags'][0]['name'])
-        
-        # Find target keyword matches
-        for term in all_terms:
-            for keyword in target_keywords:
-                if keyword.lower() in term.lower():
-                    if term not in analysis['target_objects_detected']:
-                        analysis['target_objects_detected'].append(term)
-        
-        print(f"   Found {len(analysis['tags'])} tags, {len(analysis['target_objects_detected'])} target objects")
+        print(f"   {blob_name}: found {len(analysis['tags'])} tags, {len(analysis['target_objects_detected'])} target objects")
         return analysis
 
     def analyze_all_images(self):
@@ -396,10 +739,36 @@ class AzureAIImageAnalyzer:
         print(f"🎯 Target Keywords: {', '.join(target_keywords)}")
         print("="*60)
         
+        # Images are I/O-bound (blob download + Vision POST), so analyze them
+        # concurrently and then display results in listing order
+        concurrency = self.config["analysis_settings"].get("concurrency", 8)
+        print(f"⚡ Analyzing {len(images)} images with concurrency {concurrency}")
+        
+        # Reuse results for images whose ETag matches the previous run
+        index = self._load_analysis_index() if self.config["analysis_settings"].get("skip_unchanged", True) else {}
+        # Reused results keep their original analyzed_at and are marked so consumers can tell them apart
+        unchanged = {
+            name: {**index[name]["result"], 'reused': True} for name in images
+            if name in index and index[name]["etag"] == self._image_etags.get(name)
+        }
+        to_analyze = [name for name in images if name not in unchanged]
+        if unchanged:
+            print(f"♻️  Skipping {len(unchanged)} unchanged images, {len(to_analyze)} to analyze")
+        
+        # Build the shared session and URL up front so worker threads don't race to create them
+        _ = self.http, self._vision_url
+        
+        # Every image in this batch is stamped with the run's start time
+        self._run_started_iso = datetime.now().isoformat()
+        try:
+            analyzed = self._run_analysis_pipeline(to_analyze) if to_analyze else {}
+        finally:
+            self._run_started_iso = None
+        analyzed.update(unchanged)
+        
         for i, image_name in enumerate(images, 1):
-            print(f"\n[{i}/{len(images)}] Analyzing: {image_name}")
-            
-            result = self.analyze_image_with_rest(image_name)
+            print(f"\n[{i}/{len(images)}] Analyzed: {image_name}" + (" (unchanged)" if image_name in unchanged else ""))
+            result = analyzed.get(image_name)
             if result:
                 self.results.append(result)
                 self.display_single_result(result)
@@ -407,6 +776,64 @@ class AzureAIImageAnalyzer:
         # Show summary and save results
         self.show_summary()
         self.save_results_to_blob()
+        self._save_analysis_index(analyzed)
+
+    def _analysis_fingerprint(self) -> Dict[str, Any]:
+        """Settings that affect per-image results; a change invalidates the analysis index"""
+        settings = self.config["analysis_settings"]
+        return {key: settings.get(key) for key in ("target_keywords", "confidence_threshold", "max_tags", "features")}
+
+    def _load_analysis_index(self) -> Dict[str, Dict[str, Any]]:
+        """Load the previous run's blob name -> {etag, result} index from the results container"""
+        try:
+            blob_client = self.blob_service_client.get_blob_client(
+                container=self.results_container_name,
+                blob=ANALYSIS_INDEX_BLOB
+            )
+            index = orjson.loads(blob_client.download_blob().readall())
+        except Exception:
+            return {}
+        
+        if not isinstance(index, dict):
+            print("ℹ️  Analysis index is malformed, re-analyzing all images")
+            return {}
+        if index.get("settings") != self._analysis_fingerprint():
+            print("ℹ️  Analysis settings changed since the last run, re-analyzing all images")
+            return {}
+        
+        images = index.get("images", {})
+        if not isinstance(images, dict) or not all(
+            isinstance(entry, dict) and isinstance(entry.get("etag"), str)
+            and isinstance(entry.get("result"), dict) and entry["result"].keys() >= _INDEXED_RESULT_KEYS
+            for entry in images.values()
+        ):
+            print("ℹ️  Analysis index is malformed, re-analyzing all images")
+            return {}
+        return images
+
+    def _save_analysis_index(self, analyzed: Dict[str, Optional[Dict[str, Any]]]):
+        """Write the blob name -> {etag, result} index for the next run in a single upload"""
+        index = {
+            "settings": self._analysis_fingerprint(),
+            "images": {
+                name: {"etag": self._image_etags[name], "result": result}
+                for name, result in analyzed.items()
+                if result and name in self._image_etags
+            }
+        }
+        try:
+            self._ensure_containers_exist()
+            blob_client = self.blob_service_client.get_blob_client(
+                container=self.results_container_name,
+                blob=ANALYSIS_INDEX_BLOB
+            )
+            blob_client.upload_blob(
+                orjson.dumps(index),
+                overwrite=True,
+                content_settings=ContentSettings(content_type='application/json')
+            )
+        except Exception as e:
+            print(f"⚠️  Could not save analysis index: {e}")
 
     def display_single_result(self, result: Dict[str, Any]):
         """Display results for one image"""
@@ -427,23 +854,30 @@ class AzureAIImageAnalyzer:
     def show_summary(self):
         """Show analysis summary"""
         total_images = len(self.results)
-        images_with_targets = sum(1 for r in self.results if r['target_objects_detected'])
         target_keywords = self.config["analysis_settings"]["target_keywords"]
         
         print(f"\n📊 SUMMARY:")
         print(f"   • Total images analyzed: {total_images}")
+        
+        if not self.results:
+            print(f"   • Target keywords: {', '.join(target_keywords)}")
+            return
+        
+        # Count images with targets and tally target objects in one pass
+        images_with_targets = 0
+        object_counts = Counter()
+        for result in self.results:
+            if result['target_objects_detected']:
+                images_with_targets += 1
+                object_counts.update(result['target_objects_detected'])
+        
         print(f"   • Images with target objects: {images_with_targets}")
-        print(f"   • Detection rate: {(images_with_targets/total_images)*100:.0f}%" if total_images > 0 else "")
+        print(f"   • Detection rate: {(images_with_targets/total_images)*100:.0f}%")
         print(f"   • Target keywords: {', '.join(target_keywords)}")
         
         # Most common objects found
-        all_objects = []
-        for result in self.results:
-            all_objects.extend(result['target_objects_detected'])
-        
-        if all_objects:
-            from collections import Counter
-            common_objects = Counter(all_objects).most_common(3)
+        if object_counts:
+            common_objects = object_counts.most_common(3)
             print(f"   • Most common: {', '.join([f'{obj} ({count})' for obj, count in common_objects])}")
 
     def save_results_to_blob(self):
@@ -451,11 +885,29 @@ class AzureAIImageAnalyzer:
         timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
         target_keywords = self.config["analysis_settings"]["target_keywords"]
         
+        # Accumulate all summary counters in one pass over the results
+        total_images = len(self.results)
+        images_with_targets = 0
+        confidence_sum = 0.0
+        objects_found = 0
+        tags_sum = 0
+        reused_results = 0
+        for r in self.results:
+            if r.get('reused'):
+                reused_results += 1
+            detected = len(r['target_objects_detected'])
+            if detected:
+                images_with_targets += 1
+            objects_found += detected
+            confidence_sum += r['confidence']
+            tags_sum += len(r['tags'])
+        
         # Create comprehensive results structure
         results_data = {
             'analysis_metadata': {
-                'total_images': len(self.results),
-                'images_with_targets': sum(1 for r in self.results if r['target_objects_detected']),
+                'total_images': total_images,
+                'reused_results': reused_results,
+                'images_with_targets': images_with_targets,
                 'analysis_date': datetime.now().isoformat(),
                 'target_keywords': target_keywords,
                 'confidence_threshold': self.config["analysis_settings"]["confidence_threshold"],
@@ -465,49 +917,120 @@ class AzureAIImageAnalyzer:
                 'analyzer_version': '3.0.0'
             },
             'summary_statistics': {
-                'detection_rate': (sum(1 for r in self.results if r['target_objects_detected']) / len(self.results) * 100) if self.results else 0,
-                'avg_confidence': sum(r['confidence'] for r in self.results) / len(self.results) if self.results else 0,
-                'total_objects_found': sum(len(r['target_objects_detected']) for r in self.results),
-                'avg_tags_per_image': sum(len(r['tags']) for r in self.results) / len(self.results) if self.results else 0
+                'detection_rate': (images_with_targets / total_images * 100) if total_images else 0,
+                'avg_confidence': confidence_sum / total_images if total_images else 0,
+                'total_objects_found': objects_found,
+                'avg_tags_per_image': tags_sum / total_images if total_images else 0
             },
             'configuration_used': self.config,
             'detailed_results': self.results
         }
         
-        # Convert to JSON
-        json_data = json.dumps(results_data, indent=2)
-        
-        # Save to Azure Blob Storage
+        # Serialize incrementally into a spool (in memory up to 8 MB, then on disk)
+        # so the blob upload and local backup share one copy of the JSON
+        with tempfile.SpooledTemporaryFile(max_size=8 * 1024 * 1024) as spool:
+            for chunk in self._iter_results_json(results_data):
+                spool.write(chunk)
+            json_length = spool.tell()
+            
+            # Save to Azure Blob Storage
+            try:
+                self._ensure_containers_exist()
+                blob_name = f"image_analysis_{timestamp}.json"
+                blob_client = self.blob_service_client.get_blob_client(
+                    container=self.results_container_name,
+                    blob=blob_name
+                )
+                
+                spool.seek(0)
+                blob_client.upload_blob(
+                    spool,
+                    length=json_length,
+                    overwrite=True,
+                    content_settings=ContentSettings(content_type='application/json')
+                )
+                print(f"☁️  Results saved to Azure Blob: {self.results_container_name}/{blob_name}")
+                
+                # Also create a "latest.json" for easy access via a server-side copy
+                # (same account, so no SAS is needed and the body is not re-uploaded)
+                latest_blob_client = self.blob_service_client.get_blob_client(
+                    container=self.results_container_name,
+                    blob="image_analysis_latest.json"
+                )
+                latest_blob_client.start_copy_from_url(blob_client.url)
+                print(f"☁️  Latest results: {self.results_container_name}/image_analysis_latest.json")
+                
+            except Exception as e:
+                print(f"⚠️  Could not save to blob storage: {e}")
+            
+            # Save locally as backup
+            try:
+                local_filename = f"image_analysis_results_{timestamp}.json"
+                spool.seek(0)
+                with open(local_filename, 'wb') as f:
+                    shutil.copyfileobj(spool, f)
+                print(f"💾 Local backup saved: {local_filename}")
+                
+                # Point readers at it without them having to scan the directory
+                pointer_tmp = f"{LATEST_RESULTS_POINTER}.tmp"
+                with open(pointer_tmp, 'w') as f:
+                    f.write(local_filename)
+                os.replace(pointer_tmp, LATEST_RESULTS_POINTER)
+            except Exception as e:
+                print(f"⚠️  Could not save locally: {e}")
+
+    def cleanup_old_results(self, keep: int = 30) -> int:
+        """Delete all but the newest `keep` timestamped results blobs using batch requests"""
         try:
-            blob_name = f"image_analysis_{timestamp}.json"
-            blob_client = self.blob_service_client.get_blob_client(
-                container=self.results_container_name,
-                blob=blob_name
+            container_client = self.blob_service_client.get_container_client(self.results_container_name)
+            # Timestamped names (image_analysis_YYYYmmdd_HHMMSS.json) sort chronologically
+            result_blobs = sorted(
+                name for name in self._list_container_blobs(self.results_container_name, "image_analysis_")
+                if name != "image_analysis_latest.json"
             )
+            old_blobs = result_blobs[:-keep] if keep > 0 else result_blobs
             
-            blob_client.upload_blob(json_data, overwrite=True)
-            print(f"☁️  Results saved to Azure Blob: {self.results_container_name}/{blob_name}")
+            for i in range(0, len(old_blobs), BLOB_BATCH_SIZE):
+                container_client.delete_blobs(*old_blobs[i:i + BLOB_BATCH_SIZE])
             
-            # Also create a "latest.json" for easy access
-            latest_blob_client = self.blob_service_client.get_blob_client(
-                container=self.results_container_name,
-                blob="image_analysis_latest.json"
-            )
-            latest_blob_client.upload_blob(json_data, overwrite=True)
-            print(f"☁️  Latest results: {self.results_container_name}/image_analysis_latest.json")
+            print(f"🧹 Deleted {len(old_blobs)} old results from '{self.results_container_name}'")
+            return len(old_blobs)
             
         except Exception as e:
-            print(f"⚠️  Could not save to blob storage: {e}")
-        
-        # Save locally as backup
+            print(f"⚠️  Could not clean up old results: {e}")
+            return 0
+
+    def archive_inputs(self, tier: Union[str, StandardBlobTier] = StandardBlobTier.COOL) -> int:
+        """Move the inputs analyzed in this session to a cheaper access tier ("Cool", "Cold", ...) using batch requests"""
+        analyzed = [result['filename'] for result in self.results]
         try:
-            local_filename = f"image_analysis_results_{timestamp}.json"
-            with open(local_filename, 'w') as f:
-                f.write(json_data)
-            print(f"💾 Local backup saved: {local_filename}")
+            tier = StandardBlobTier(tier)
+            container_client = self.blob_service_client.get_container_client(self.input_container_name)
+            for i in range(0, len(analyzed), BLOB_BATCH_SIZE):
+                container_client.set_standard_blob_tier_blobs(tier, *analyzed[i:i + BLOB_BATCH_SIZE])
+            
+            print(f"🗄️  Moved {len(analyzed)} analyzed inputs to the {tier.value} tier")
+            return len(analyzed)
+            
         except Exception as e:
-            print(f"⚠️  Could not save locally: {e}")
+            print(f"⚠️  Could not archive analyzed inputs: {e}")
+            return 0
 
+    @staticmethod
+    def _iter_results_json(results_data: Dict[str, Any]):
+        """Yield the results document as indented JSON bytes, one detailed result at a time"""
+        yield b"{"
+        for i, (key, value) in enumerate(results_data.items()):
+            yield (b"\n  " if i == 0 else b",\n  ") + orjson.dumps(key) + b": "
+            if key == 'detailed_results' and value:
+                yield b"["
+                for j, item in enumerate(value):
+                    item_json = orjson.dumps(item, option=orjson.OPT_INDENT_2).replace(b"\n", b"\n    ")
+                    yield (b"\n    " if j == 0 else b",\n    ") + item_json
+                yield b"\n  ]"
+            else:
+                yield orjson.dumps(value, option=orjson.OPT_INDENT_2).replace(b"\n", b"\n  ")
+        yield b"\n}"
 
 def generate_random_suffix(length: int = 6) -> str:
     """Generate random string for resource naming"""
@@ -548,7 +1071,8 @@ def main():
         print(f"🎯 Target Keywords: {', '.join(analyzer.config['analysis_settings']['target_keywords'])}")
         
         # Analyze all images and save results
-        analyzer.analyze_all_images()
+        with analyzer:
+            analyzer.analyze_all_images()
         
         print("\n✅ Analysis complete with results stored in Azure Blob Storage!")
         
@@ -599,6 +1123,7 @@ if __name__ == "__main__":
 {
   "analysis_metadata": {
     "total_images": 25,
+    "reused_results": 20,
     "images_with_targets": 18,
     "target_keywords": ["car", "person", "building"],
     "confidence_threshold": 0.5,
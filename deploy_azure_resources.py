@@ -3,15 +3,137 @@ Azure Resource Deployment Script for AI Image Analyzer
 Automatically creates all required Azure resources with proper RBAC permissions
 """
 
-import json
 import argparse
+import base64
+import hashlib
 import subprocess
-import random
-import string
 import os
+import shutil
+import tempfile
+import threading
 import time
-from pathlib import Path
-from typing import Dict, Any
+import uuid
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime, timezone
+from functools import cached_property, lru_cache
+from typing import TYPE_CHECKING, Dict, Any, List, Optional
+
+import orjson
+
+from azure.core.credentials import AccessToken
+from azure.core.exceptions import AzureError, HttpResponseError, ResourceExistsError, ServiceRequestError
+
+# azure.mgmt.* and the data-plane SDKs are large; they're imported where first
+# used so `--help` and argument errors stay fast (here and in deploy_container_app.py)
+if TYPE_CHECKING:
+    from azure.keyvault.secrets import SecretClient
+    from azure.mgmt.authorization import AuthorizationManagementClient
+    from azure.mgmt.cognitiveservices import CognitiveServicesManagementClient
+    from azure.mgmt.keyvault import KeyVaultManagementClient
+    from azure.mgmt.resource import ResourceManagementClient, SubscriptionClient
+    from azure.mgmt.storage import StorageManagementClient
+    from azure.storage.blob import BlobServiceClient
+
+# Resolved once: without a shell, Windows needs the full path to az.cmd
+AZ_CLI = shutil.which("az") or "az"
+
+# Environment for every az call: JSON output regardless of the user's
+# `az config` default, and no telemetry upload process spawned after each command
+AZ_ENV = {**os.environ, "AZURE_CORE_OUTPUT": "json", "AZURE_CORE_COLLECT_TELEMETRY": "false"}
+
+# Built-in "Key Vault Administrator" role definition
+KEY_VAULT_ADMINISTRATOR_ROLE_ID = "00482a5a-887f-4fb3-b363-3b7fe8e74483"
+
+# Resource providers the deployment creates resources in
+REQUIRED_PROVIDERS = ("Microsoft.Storage", "Microsoft.CognitiveServices", "Microsoft.KeyVault")
+
+# Seconds between polls for creates that usually finish in well under the
+# 30s ARM default (storage account, Key Vault)
+FAST_LRO_POLLING_INTERVAL = 5
+
+# Concurrent sample image uploads (and HTTP connections kept for them)
+UPLOAD_WORKERS = 16
+
+# Images above this size are uploaded as parallel blocks of this size
+BLOCK_SIZE = 4 * 1024 * 1024
+LARGE_UPLOAD_CONCURRENCY = 4
+
+# Sample image types uploaded by upload_sample_images
+IMAGE_EXTENSIONS = frozenset({'.jpg', '.jpeg', '.png', '.bmp', '.tiff', '.gif'})
+
+
+class PreflightError(Exception):
+    """Raised by validate_prereqs with every missing prerequisite"""
+    
+    def __init__(self, problems: List[str]):
+        self.problems = problems
+        super().__init__("Preflight checks failed:\n" + "\n".join(f"   - {p}" for p in problems))
+
+
+class CachedTokenCredential:
+    """
+    Token credential wrapper that hands every client the same token per scope
+    
+    Each SDK client caches tokens only for itself, and the Azure CLI credential
+    launches `az account get-access-token` on every request, so without this the
+    six ARM clients would each spawn their own az process for an identical token.
+    """
+    
+    # Refresh a little before expiry so a token never lapses mid-request
+    REFRESH_MARGIN = 300
+    
+    def __init__(self, credential):
+        self._credential = credential
+        self._tokens: Dict[tuple, AccessToken] = {}
+        self._lock = threading.Lock()
+    
+    def get_token(self, *scopes: str, **kwargs) -> AccessToken:
+        # Claims challenges need a fresh token, so they always go to the wrapped credential
+        if kwargs.get("claims"):
+            return self._credential.get_token(*scopes, **kwargs)
+        
+        key = (scopes, kwargs.get("tenant_id"))
+        with self._lock:
+            token = self._tokens.get(key)
+            if token is None or token.expires_on - self.REFRESH_MARGIN < time.time():
+                token = self._tokens[key] = self._credential.get_token(*scopes, **kwargs)
+            return token
+
+
+@lru_cache(maxsize=None)
+def get_azure_credential() -> CachedTokenCredential:
+    """
+    Process-wide Azure credential shared by every SDK client
+    
+    Deployment already requires az login, so the managed identity probe (an
+    IMDS timeout when not running on Azure) and the other developer-tool
+    credentials are skipped and the Azure CLI credential is reached directly.
+    """
+    from azure.identity import DefaultAzureCredential
+    
+    return CachedTokenCredential(DefaultAzureCredential(
+        exclude_managed_identity_credential=True,
+        exclude_shared_token_cache_credential=True,
+        exclude_visual_studio_code_credential=True,
+        exclude_interactive_browser_credential=True
+    ))
+
+
+def write_file_atomic(path: str, content: bytes, mode: int = 0o644):
+    """Write content to a temp file next to path, then rename it over path in one step"""
+    # A fresh uniquely named temp file (created 0600) per call, so concurrent runs
+    # and leftovers from a crashed run can't interfere
+    directory, name = os.path.split(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=f".{name}.", suffix=".tmp")
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(content)
+        os.chmod(tmp_path, mode)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
 
 class AzureResourceDeployer:
     def __init__(self, resource_group: str, location: str, config_file: str = "config.json"):
@@ -25,27 +147,42 @@ class AzureResourceDeployer:
         
         # Generate resource names
         self.resource_names = self._generate_resource_names()
+        self.storage_name = self.resource_names["storage_account"]
+        self.vision_name = self.resource_names["ai_vision"]
+        self.kv_name = self.resource_names["key_vault"]
+        self.input_container_name = self.config["containers"]["input_container"]
+        self.results_container_name = self.config["containers"]["results_container"]
         
-        # Get current user info for RBAC
+        # Get current user info for RBAC (filled in by check_azure_login)
         self.current_user_id = None
+        self.subscription_id = None
+        self.tenant_id = None
+        
+        # Every management and data-plane client shares one in-process credential
+        self.credential = get_azure_credential()
+        self._blob_service_client = None
         
     def _generate_suffix(self) -> str:
         """Generate random suffix for unique resource names"""
-        return ''.join(random.choices(string.ascii_lowercase + string.digits, k=6))
+        return os.urandom(3).hex()
     
     def _load_config(self) -> Dict[str, Any]:
         """Load configuration file"""
-        if os.path.exists(self.config_file):
-            with open(self.config_file, 'r') as f:
-                return json.load(f)
-        else:
+        try:
+            with open(self.config_file, 'rb') as f:
+                return orjson.loads(f.read())
+        except FileNotFoundError:
             # Return default config if file doesn't exist
             return {
                 "analysis_settings": {
                     "target_keywords": ["cat", "dog", "animal", "pet"],
                     "confidence_threshold": 0.5,
                     "max_tags": 10,
-                    "features": ["caption", "tags", "objects"]
+                    "features": ["caption", "tags", "objects"],
+                    "concurrency": 8,
+                    "blob_parallelism": 4,
+                    "image_source": "url",
+                    "skip_unchanged": True
                 },
                 "containers": {
                     "input_container": "input-images",
@@ -68,23 +205,26 @@ class AzureResourceDeployer:
             "key_vault": f"{naming['keyvault_prefix']}-{self.suffix}"
         }
     
-    def _run_az_command(self, command: str, ignore_errors: bool = False) -> Dict[str, Any]:
-        """Run Azure CLI command and return JSON result"""
+    def _run_az_command(self, args: List[str], query: Optional[str] = None,
+                        ignore_errors: bool = False) -> Dict[str, Any]:
+        """Run `az <args>` and return JSON result, trimmed server-side to the JMESPath query if given"""
+        if query:
+            args = [*args, "--query", query]
         try:
-            print(f"   Running: {command}")
+            print(f"   Running: az {' '.join(args)}")
             result = subprocess.run(
-                command, 
-                shell=True, 
+                [AZ_CLI, *args], 
+                env=AZ_ENV, 
                 check=True, 
-                capture_output=True, 
-                text=True
+                capture_output=True
             )
             
+            # Raw bytes go straight to orjson, no intermediate str decode
             if result.stdout.strip():
                 try:
-                    return json.loads(result.stdout)
-                except json.JSONDecodeError:
-                    return {"output": result.stdout.strip()}
+                    return orjson.loads(result.stdout)
+                except orjson.JSONDecodeError:
+                    return {"output": result.stdout.decode().strip()}
             return {}
             
         except subprocess.CalledProcessError as e:
@@ -92,181 +232,263 @@ class AzureResourceDeployer:
                 print(f"   ⚠️  Command failed (ignoring): {e}")
                 return {}
             print(f"   ❌ Command failed: {e}")
-            print(f"   Error output: {e.stderr}")
+            print(f"   Error output: {e.stderr.decode(errors='replace')}")
             raise
     
-    def _run_az_command_text(self, command: str) -> str:
-        """Run Azure CLI command and return text result"""
-        try:
-            print(f"   Running: {command}")
-            result = subprocess.run(
-                command, 
-                shell=True, 
-                check=True, 
-                capture_output=True, 
-                text=True
-            )
-            return result.stdout.strip()
-        except subprocess.CalledProcessError as e:
-            print(f"   ❌ Command failed: {e}")
-            print(f"   Error output: {e.stderr}")
-            raise
+    @cached_property
+    def resource_client(self) -> "ResourceManagementClient":
+        from azure.mgmt.resource import ResourceManagementClient
+        return ResourceManagementClient(self.credential, self.subscription_id)
+    
+    @cached_property
+    def subscription_client(self) -> "SubscriptionClient":
+        from azure.mgmt.resource import SubscriptionClient
+        return SubscriptionClient(self.credential)
+    
+    @cached_property
+    def storage_client(self) -> "StorageManagementClient":
+        from azure.mgmt.storage import StorageManagementClient
+        return StorageManagementClient(self.credential, self.subscription_id)
+    
+    @cached_property
+    def vision_client(self) -> "CognitiveServicesManagementClient":
+        from azure.mgmt.cognitiveservices import CognitiveServicesManagementClient
+        return CognitiveServicesManagementClient(self.credential, self.subscription_id)
+    
+    @cached_property
+    def keyvault_client(self) -> "KeyVaultManagementClient":
+        from azure.mgmt.keyvault import KeyVaultManagementClient
+        return KeyVaultManagementClient(self.credential, self.subscription_id)
+    
+    @cached_property
+    def authorization_client(self) -> "AuthorizationManagementClient":
+        from azure.mgmt.authorization import AuthorizationManagementClient
+        return AuthorizationManagementClient(self.credential, self.subscription_id)
     
     def check_azure_login(self) -> bool:
         """Check if user is logged in to Azure CLI and get user info"""
         try:
-            account_info = self._run_az_command("az account show")
+            # The only az call left: it picks the CLI's default subscription and proves we're logged in
+            account_info = self._run_az_command(["account", "show"], query="{id:id, tenantId:tenantId}")
             print("✅ Azure CLI authentication verified")
             
-            # Get current user ID for RBAC assignments
-            user_info = self._run_az_command("az ad signed-in-user show")
-            self.current_user_id = user_info.get("id") or user_info.get("objectId")
+            self.subscription_id = account_info.get("id")
+            self.tenant_id = account_info.get("tenantId")
+            
+            # Get current user ID for RBAC assignments from the ARM token itself
+            self.current_user_id = self._token_object_id()
             
             if self.current_user_id:
                 print(f"✅ Current user ID: {self.current_user_id}")
             else:
-                print("⚠️  Could not get user ID - will try alternative method")
+                print("⚠️  Could not get user ID - Key Vault permissions may need to be granted manually")
             
             return True
-        except:
-            print("❌ Not logged in to Azure CLI")
+        except subprocess.CalledProcessError as e:
+            print(f"❌ Not logged in to Azure CLI ({e})")
+            print("Please run: az login")
+            return False
+        except Exception as e:
+            # e.g. the ARM token couldn't be fetched or decoded
+            print(f"❌ Could not verify Azure login: {e}")
             print("Please run: az login")
             return False
     
+    def _token_object_id(self) -> Optional[str]:
+        """Object ID (oid claim) of the signed-in principal, read from an ARM access token"""
+        token = self.credential.get_token("https://management.azure.com/.default").token
+        payload = token.split(".")[1]
+        claims = orjson.loads(base64.urlsafe_b64decode(payload + "=" * (-len(payload) % 4)))
+        return claims.get("oid")
+    
+    def validate_prereqs(self):
+        """Check provider registrations and the target region up front, raising PreflightError with every problem found"""
+        print("🔎 Checking subscription prerequisites...")
+        
+        def check_provider(namespace: str) -> Optional[str]:
+            state = self.resource_client.providers.get(namespace).registration_state
+            if state not in ("Registered", "Registering"):
+                return f"Resource provider {namespace} is {state or 'unknown'} (run: az provider register --namespace {namespace})"
+            return None
+        
+        def check_location() -> Optional[str]:
+            locations = self.subscription_client.subscriptions.list_locations(self.subscription_id)
+            if not any(location.name == self.location for location in locations):
+                return f"Location '{self.location}' is not available in this subscription"
+            return None
+        
+        checks = [lambda ns=ns: check_provider(ns) for ns in REQUIRED_PROVIDERS] + [check_location]
+        problems = []
+        with ThreadPoolExecutor(max_workers=len(checks)) as executor:
+            for future in [executor.submit(check) for check in checks]:
+                try:
+                    problem = future.result()
+                except AzureError as e:
+                    # Includes auth and network failures, not just error responses
+                    problem = f"Preflight check failed: {e.message}"
+                if problem:
+                    problems.append(problem)
+        
+        if problems:
+            raise PreflightError(problems)
+        print("✅ Subscription prerequisites verified")
+    
     def create_resource_group(self):
         """Create resource group"""
         print(f"📦 Creating resource group: {self.resource_group}")
         
-        command = f"az group create --name {self.resource_group} --location {self.location}"
-        self._run_az_command(command)
+        self.resource_client.resource_groups.create_or_update(self.resource_group, {"location": self.location})
         print(f"✅ Resource group '{self.resource_group}' created in {self.location}")
     
     def create_storage_account(self) -> str:
         """Create storage account and containers"""
-        storage_name = self.resource_names["storage_account"]
-        print(f"💾 Creating storage account: {storage_name}")
+        print(f"💾 Creating storage account: {self.storage_name}")
         
-        # Create storage account
-        command = f"""az storage account create 
-            --name {storage_name} 
-            --resource-group {self.resource_group} 
-            --location {self.location} 
-            --sku Standard_LRS 
-            --kind StorageV2""".replace('\n', ' ')
+        from azure.mgmt.storage.models import Sku as StorageSku, StorageAccountCreateParameters
         
-        self._run_az_command(command)
-        
-        # Get connection string
-        command = f"""az storage account show-connection-string 
-            --name {storage_name} 
-            --resource-group {self.resource_group} 
-            --query connectionString -o tsv""".replace('\n', ' ')
-        
-        connection_string = self._run_az_command_text(command)
+        # Create storage account
+        account = self.storage_client.storage_accounts.begin_create(
+            self.resource_group,
+            self.storage_name,
+            StorageAccountCreateParameters(
+                sku=StorageSku(name="Standard_LRS"),
+                kind="StorageV2",
+                location=self.location
+            ),
+            polling_interval=FAST_LRO_POLLING_INTERVAL
+        ).result()
+        
+        # Build the connection string from the account key; the endpoint suffix comes from the
+        # created account's blob endpoint (https://<name>.blob.<suffix>/) so other clouds work too
+        account_key = self.storage_client.storage_accounts.list_keys(self.resource_group, self.storage_name).keys[0].value
+        endpoint_suffix = account.primary_endpoints.blob.rstrip("/").split(".blob.", 1)[1]
+        connection_string = (f"DefaultEndpointsProtocol=https;AccountName={self.storage_name};"
+                             f"AccountKey={account_key};EndpointSuffix={endpoint_suffix}")
         
         # Create containers
         containers = [
-            self.config["containers"]["input_container"],
-            self.config["containers"]["results_container"]
+            self.input_container_name,
+            self.results_container_name
         ]
         
+        # Created through the SDK so the connection string never lands on a command line
+        blob_service = self._blob_service(connection_string)
         for container in containers:
             print(f"   📁 Creating container: {container}")
-            command = f"""az storage container create 
-                --name {container} 
-                --connection-string "{connection_string}" """.replace('\n', ' ')
-            
-            self._run_az_command(command)
+            try:
+                blob_service.create_container(container)
+            except ResourceExistsError:
+                pass
         
-        print(f"✅ Storage account '{storage_name}' created with containers")
+        print(f"✅ Storage account '{self.storage_name}' created with containers")
         return connection_string
     
+    def _blob_service(self, storage_connection: str) -> "BlobServiceClient":
+        """Blob client for the deployed storage account, created once so its connections are reused"""
+        if self._blob_service_client is None:
+            import requests
+            from requests.adapters import HTTPAdapter
+            from azure.core.pipeline.transport import RequestsTransport
+            from azure.storage.blob import BlobServiceClient
+            
+            # requests keeps only 10 connections per host by default; size the pool to the
+            # upload workers so none of them has to open a fresh TLS connection per blob
+            session = requests.Session()
+            session.mount("https://", HTTPAdapter(pool_maxsize=UPLOAD_WORKERS))
+            self._blob_service_client = BlobServiceClient.from_connection_string(
+                storage_connection, transport=RequestsTransport(session=session),
+                max_single_put_size=BLOCK_SIZE, max_block_size=BLOCK_SIZE)
+        return self._blob_service_client
+    
     def create_ai_vision(self) -> Dict[str, str]:
         """Create AI Vision service"""
-        vision_name = self.resource_names["ai_vision"]
-        print(f"👁️  Creating AI Vision service: {vision_name}")
-        
-        # Create AI Vision service
-        command = f"""az cognitiveservices account create 
-            --name {vision_name} 
-            --resource-group {self.resource_group} 
-            --kind ComputerVision 
-            --sku S1 
-            --location {self.location}""".replace('\n', ' ')
-        
-        self._run_az_command(command)
-        
-        # Get endpoint
-        command = f"""az cognitiveservices account show 
-            --name {vision_name} 
-            --resource-group {self.resource_group} 
-            --query properties.endpoint -o tsv""".replace('\n', ' ')
-        
-        endpoint = self._run_az_command_text(command)
+        print(f"👁️  Creating AI Vision service: {self.vision_name}")
+        
+        from azure.mgmt.cognitiveservices.models import Account, AccountProperties, Sku as CognitiveServicesSku
+        
+        # Create AI Vision service; the created account already carries its endpoint
+        account = self.vision_client.accounts.begin_create(
+            self.resource_group,
+            self.vision_name,
+            Account(
+                kind="ComputerVision",
+                sku=CognitiveServicesSku(name="S1"),
+                location=self.location,
+                properties=AccountProperties()
+            )
+        ).result()
+        endpoint = account.properties.endpoint
         
         # Get key
-        command = f"""az cognitiveservices account keys list 
-            --name {vision_name} 
-            --resource-group {self.resource_group} 
-            --query key1 -o tsv""".replace('\n', ' ')
-        
-        key = self._run_az_command_text(command)
+        key = self.vision_client.accounts.list_keys(self.resource_group, self.vision_name).key1
         
-        print(f"✅ AI Vision service '{vision_name}' created")
+        print(f"✅ AI Vision service '{self.vision_name}' created")
         return {"endpoint": endpoint, "key": key}
     
-    def create_key_vault_with_permissions(self, storage_connection: str, vision_info: Dict[str, str]) -> str:
-        """Create Key Vault with proper permissions and store secrets"""
-        kv_name = self.resource_names["key_vault"]
-        print(f"🔐 Creating Key Vault: {kv_name}")
+    def create_key_vault_with_permissions(self) -> "SecretClient":
+        """Create Key Vault with proper permissions and return a client ready to write secrets"""
+        print(f"🔐 Creating Key Vault: {self.kv_name}")
         
-        # Create Key Vault with RBAC enabled
-        command = f"""az keyvault create 
-            --name {kv_name} 
-            --resource-group {self.resource_group} 
-            --location {self.location}
-            --enable-rbac-authorization true""".replace('\n', ' ')
+        from azure.mgmt.authorization.models import RoleAssignmentCreateParameters
+        from azure.keyvault.secrets import SecretClient
+        from azure.mgmt.keyvault.models import Sku as KeyVaultSku, VaultCreateOrUpdateParameters, VaultProperties
         
-        self._run_az_command(command)
-        print(f"✅ Key Vault '{kv_name}' created with RBAC enabled")
+        # Create Key Vault with RBAC enabled
+        vault = self.keyvault_client.vaults.begin_create_or_update(
+            self.resource_group,
+            self.kv_name,
+            VaultCreateOrUpdateParameters(
+                location=self.location,
+                properties=VaultProperties(
+                    tenant_id=self.tenant_id,
+                    sku=KeyVaultSku(family="A", name="standard"),
+                    enable_rbac_authorization=True
+                )
+            ),
+            polling_interval=FAST_LRO_POLLING_INTERVAL
+        ).result()
+        print(f"✅ Key Vault '{self.kv_name}' created with RBAC enabled")
+        
+        kv_resource_id = vault.id
+        key_vault_url = vault.properties.vault_uri
+        secret_client = SecretClient(vault_url=key_vault_url, credential=self.credential)
         
         # Wait for propagation
         print("⏳ Waiting for Key Vault to be ready...")
-        time.sleep(10)
-        
-        # Get Key Vault resource ID
-        kv_resource_id = f"/subscriptions/{self._get_subscription_id()}/resourceGroups/{self.resource_group}/providers/Microsoft.KeyVault/vaults/{kv_name}"
+        if not self._wait_for(lambda: self._vault_access(secret_client) is not None):
+            print("⚠️  Key Vault not reachable yet, continuing anyway")
         
         # Assign Key Vault Administrator role to current user
         print("🔑 Assigning Key Vault Administrator permissions...")
         
-        if self.current_user_id:
-            # Method 1: Use user ID
-            command = f"""az role assignment create 
-                --assignee {self.current_user_id} 
-                --role "Key Vault Administrator" 
-                --scope "{kv_resource_id}" """.replace('\n', ' ')
-        else:
-            # Method 2: Use signed-in user
-            command = f"""az role assignment create 
-                --assignee-object-id $(az ad signed-in-user show --query id -o tsv) 
-                --role "Key Vault Administrator" 
-                --scope "{kv_resource_id}" """.replace('\n', ' ')
-        
         try:
-            self._run_az_command(command)
+            self.authorization_client.role_assignments.create(
+                kv_resource_id,
+                str(uuid.uuid4()),
+                RoleAssignmentCreateParameters(
+                    role_definition_id=(f"/subscriptions/{self.subscription_id}/providers/"
+                                        f"Microsoft.Authorization/roleDefinitions/{KEY_VAULT_ADMINISTRATOR_ROLE_ID}"),
+                    principal_id=self.current_user_id
+                )
+            )
             print("✅ Key Vault Administrator permissions assigned")
         except Exception as e:
             print(f"⚠️  Warning: Could not assign permissions automatically: {e}")
             print("   Trying alternative permission method...")
             
             # Alternative: Use access policy instead of RBAC
-            self._setup_keyvault_access_policy(kv_name)
+            self._setup_keyvault_access_policy(self.kv_name)
         
         # Wait for permissions to propagate
         print("⏳ Waiting for permissions to propagate...")
-        time.sleep(15)
+        if not self._wait_for(lambda: self._vault_access(secret_client), timeout=120):
+            print("⚠️  Permissions not visible yet, relying on secret retries")
         
+        return secret_client
+    
+    def store_key_vault_secrets(self, secret_client: "SecretClient", storage_connection: str,
+                                vision_info: Dict[str, str]) -> str:
+        """Store the storage and AI Vision credentials in Key Vault and return its URL"""
         # Store secrets with retry logic
         secrets = {
             "storage-connection-string": storage_connection,
@@ -274,59 +496,88 @@ class AzureResourceDeployer:
             "vision-key": vision_info["key"]
         }
         
-        for secret_name, secret_value in secrets.items():
-            self._store_secret_with_retry(kv_name, secret_name, secret_value)
+        self._store_secrets(secret_client, secrets)
         
-        key_vault_url = f"https://{kv_name}.vault.azure.net/"
-        print(f"✅ Key Vault '{kv_name}' created with secrets")
-        return key_vault_url
+        print(f"✅ Key Vault '{self.kv_name}' created with secrets")
+        return f"{secret_client.vault_url}/"
     
-    def _get_subscription_id(self) -> str:
-        """Get current subscription ID"""
-        command = "az account show --query id -o tsv"
-        return self._run_az_command_text(command)
+    @staticmethod
+    def _wait_for(condition, timeout: float = 60, initial: float = 0.5, max_interval: float = 4) -> bool:
+        """Poll condition() with exponential backoff until it is true or timeout seconds pass"""
+        deadline = time.monotonic() + timeout
+        interval = initial
+        while not condition():
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return False
+            time.sleep(min(interval, remaining))
+            interval = min(interval * 2, max_interval)
+        return True
+    
+    @staticmethod
+    def _vault_access(secret_client: "SecretClient") -> Optional[bool]:
+        """True if secrets can be listed, False if the vault answers but denies access, None if unreachable"""
+        try:
+            next(iter(secret_client.list_properties_of_secrets()), None)
+            return True
+        except HttpResponseError:
+            return False
+        except ServiceRequestError:
+            return None
     
     def _setup_keyvault_access_policy(self, kv_name: str):
         """Setup Key Vault access policy as fallback"""
         print("   🔑 Setting up Key Vault access policy as fallback...")
         
-        # Get current user principal name
+        from azure.mgmt.keyvault.models import (
+            AccessPolicyEntry, AccessPolicyUpdateKind, Permissions,
+            VaultAccessPolicyParameters, VaultAccessPolicyProperties
+        )
+        
         try:
-            upn_command = "az ad signed-in-user show --query userPrincipalName -o tsv"
-            upn = self._run_az_command_text(upn_command)
-            
-            command = f"""az keyvault set-policy 
-                --name {kv_name} 
-                --upn {upn} 
-                --secret-permissions get list set delete""".replace('\n', ' ')
-            
-            self._run_az_command(command)
+            self.keyvault_client.vaults.update_access_policy(
+                self.resource_group,
+                kv_name,
+                AccessPolicyUpdateKind.ADD,
+                VaultAccessPolicyParameters(properties=VaultAccessPolicyProperties(access_policies=[
+                    AccessPolicyEntry(
+                        tenant_id=self.tenant_id,
+                        object_id=self.current_user_id,
+                        permissions=Permissions(secrets=["get", "list", "set", "delete"])
+                    )
+                ]))
+            )
             print("   ✅ Access policy configured")
         except Exception as e:
             print(f"   ⚠️  Could not set access policy: {e}")
     
-    def _store_secret_with_retry(self, kv_name: str, secret_name: str, secret_value: str, max_retries: int = 3):
-        """Store secret in Key Vault with retry logic"""
-        print(f"   🔑 Storing secret: {secret_name}")
+    def _store_secrets(self, secret_client: "SecretClient", secrets: Dict[str, str], max_retries: int = 6):
+        """Store secrets in Key Vault in parallel, retrying failures with exponential backoff"""
+        print(f"   🔑 Storing secrets: {', '.join(secrets)}")
         
+        pending = dict(secrets)
         for attempt in range(max_retries):
-            try:
-                command = f"""az keyvault secret set 
-                    --vault-name {kv_name} 
-                    --name "{secret_name}" 
-                    --value "{secret_value}" """.replace('\n', ' ')
-                
-                self._run_az_command(command)
-                print(f"   ✅ Secret '{secret_name}' stored successfully")
+            with ThreadPoolExecutor(max_workers=len(pending)) as executor:
+                futures = {executor.submit(secret_client.set_secret, name, value): name
+                           for name, value in pending.items()}
+                for future in as_completed(futures):
+                    secret_name = futures[future]
+                    try:
+                        future.result()
+                        print(f"   ✅ Secret '{secret_name}' stored successfully")
+                        del pending[secret_name]
+                    except Exception as e:
+                        last_error = e
+            
+            if not pending:
                 return
-                
-            except Exception as e:
-                if attempt < max_retries - 1:
-                    print(f"   ⚠️  Attempt {attempt + 1} failed, retrying in 10 seconds...")
-                    time.sleep(10)
-                else:
-                    print(f"   ❌ Failed to store secret '{secret_name}' after {max_retries} attempts: {e}")
-                    raise
+            if attempt < max_retries - 1:
+                delay = 0.5 * 2 ** attempt
+                print(f"   ⚠️  Attempt {attempt + 1} failed for {', '.join(pending)}, retrying in {delay:g} seconds...")
+                time.sleep(delay)
+        
+        print(f"   ❌ Failed to store secrets {', '.join(pending)} after {max_retries} attempts: {last_error}")
+        raise last_error
     
     def create_local_credentials_file(self, storage_connection: str, vision_info: Dict[str, str]):
         """Create local credentials file for development"""
@@ -345,8 +596,8 @@ vision_key={vision_info["key"]}
 # python azure_ai_image_analyzer.py
 """
         
-        with open("creds.txt", "w") as f:
-            f.write(creds_content)
+        # Owner-only, like the analyzer's secret cache
+        write_file_atomic("creds.txt", creds_content.encode(), mode=0o600)
         
         print("✅ Local credentials file created")
         print("⚠️  Remember: creds.txt is gitignored for security")
@@ -360,41 +611,60 @@ vision_key={vision_info["key"]}
         
         print(f"📤 Uploading sample images from '{images_folder}' folder")
         
-        input_container = self.config["containers"]["input_container"]
-        image_extensions = ('.jpg', '.jpeg', '.png', '.bmp', '.tiff', '.gif')
         uploaded_count = 0
+        skipped_count = 0
+        failed_count = 0
         
-        # Get list of image files
-        image_files = [f for f in Path(images_folder).glob('*') 
-                      if f.is_file() and f.suffix.lower() in image_extensions]
+        # Get list of image files (scandir entries carry their file type, so no extra stat)
+        with os.scandir(images_folder) as entries:
+            image_files = [e for e in entries
+                           if e.is_file() and os.path.splitext(e.name)[1].lower() in IMAGE_EXTENSIONS]
         
         print(f"   Found {len(image_files)} image files to upload")
         
-        # Upload in batches to avoid overwhelming the system
-        batch_size = 10
-        for i in range(0, len(image_files), batch_size):
-            batch = image_files[i:i + batch_size]
-            print(f"   📦 Uploading batch {i//batch_size + 1}/{(len(image_files) + batch_size - 1)//batch_size}")
-            
-            for file_path in batch:
-                blob_name = file_path.name
-                
-                command = f"""az storage blob upload 
-                    --container-name {input_container} 
-                    --file "{file_path}" 
-                    --name "{blob_name}" 
-                    --connection-string "{storage_connection}" 
-                    --overwrite""".replace('\n', ' ')
-                
+        container_client = self._blob_service(storage_connection).get_container_client(self.input_container_name)
+        from azure.storage.blob import ContentSettings
+        
+        # One listing tells us what a previous deploy already uploaded
+        existing_md5 = {blob.name: blob.content_settings.content_md5
+                        for blob in container_client.list_blobs()}
+        
+        def upload(entry: os.DirEntry) -> bool:
+            with open(entry.path, 'rb') as data:
+                local_md5 = hashlib.file_digest(data, 'md5').digest()
+                remote_md5 = existing_md5.get(entry.name)
+                if remote_md5 and local_md5 == bytes(remote_md5):
+                    return False
+                data.seek(0)
+                # Stream from the open file; small files go up as one put, larger ones as
+                # BLOCK_SIZE blocks staged in parallel. Staged blocks get no Content-MD5 from
+                # the service, so set it here for the check above to match on the next run
+                size = entry.stat().st_size
+                container_client.upload_blob(name=entry.name, data=data, length=size, overwrite=True,
+                                             content_settings=ContentSettings(content_md5=bytearray(local_md5)),
+                                             max_concurrency=LARGE_UPLOAD_CONCURRENCY if size > BLOCK_SIZE else 1)
+            return True
+        
+        # Uploads share the client's connection pool; the pool size caps how many run at once
+        with ThreadPoolExecutor(max_workers=UPLOAD_WORKERS) as executor:
+            futures = {executor.submit(upload, entry): entry for entry in image_files}
+            for future in as_completed(futures):
                 try:
-                    self._run_az_command(command)
+                    if not future.result():
+                        skipped_count += 1
+                        continue
                     uploaded_count += 1
                     if uploaded_count % 10 == 0:
                         print(f"      ✅ Uploaded {uploaded_count} images...")
                 except Exception as e:
-                    print(f"   ⚠️  Failed to upload {blob_name}: {e}")
+                    failed_count += 1
+                    print(f"   ⚠️  Failed to upload {futures[future].name}: {e}")
         
         print(f"✅ Uploaded {uploaded_count} sample images")
+        if skipped_count:
+            print(f"   ⏭️  Skipped {skipped_count} images already in '{self.input_container_name}'")
+        if failed_count:
+            print(f"   ⚠️  {failed_count} images failed to upload")
     
     def update_config_with_resources(self, key_vault_url: str):
         """Update configuration file with deployed resource information"""
@@ -406,12 +676,11 @@ vision_key={vision_info["key"]}
             "location": self.location,
             "key_vault_url": key_vault_url,
             "resource_names": self.resource_names,
-            "deployment_date": time.strftime("%Y-%m-%dT%H:%M:%S")
+            "deployment_date": datetime.now(timezone.utc).isoformat(timespec='seconds')
         }
         
         # Save updated config
-        with open(self.config_file, 'w') as f:
-            json.dump(self.config, f, indent=2)
+        write_file_atomic(self.config_file, orjson.dumps(self.config, option=orjson.OPT_INDENT_2))
         
         print(f"✅ Configuration updated: {self.config_file}")
     
@@ -427,25 +696,42 @@ vision_key={vision_info["key"]}
         if not self.check_azure_login():
             return {}
         
+        # Fail before creating anything if the subscription can't host the resources
+        try:
+            self.validate_prereqs()
+        except PreflightError as e:
+            print(f"❌ {e}")
+            return {}
+        
         try:
             # Deploy resources step by step
             self.create_resource_group()
-            storage_connection = self.create_storage_account()
-            vision_info = self.create_ai_vision()
-            
-            # Try to create Key Vault with proper permissions
-            try:
-                key_vault_url = self.create_key_vault_with_permissions(storage_connection, vision_info)
-            except Exception as e:
-                print(f"⚠️  Key Vault creation failed: {e}")
-                print("📝 Falling back to local credentials only...")
-                key_vault_url = None
-            
-            # Create local credentials for development
-            self.create_local_credentials_file(storage_connection, vision_info)
             
-            # Upload sample images
-            self.upload_sample_images(storage_connection)
+            # Storage, AI Vision and Key Vault don't depend on each other; only the
+            # Key Vault secrets need the first two, so provision all three at once
+            with ThreadPoolExecutor(max_workers=4) as executor:
+                storage_future = executor.submit(self.create_storage_account)
+                vision_future = executor.submit(self.create_ai_vision)
+                vault_future = executor.submit(self.create_key_vault_with_permissions)
+                storage_connection = storage_future.result()
+                
+                # Sample upload only needs storage, so it runs while AI Vision and
+                # Key Vault are still being set up
+                upload_future = executor.submit(self.upload_sample_images, storage_connection)
+                vision_info = vision_future.result()
+                
+                # Try to create Key Vault with proper permissions
+                try:
+                    key_vault_url = self.store_key_vault_secrets(vault_future.result(), storage_connection, vision_info)
+                except Exception as e:
+                    print(f"⚠️  Key Vault creation failed: {e}")
+                    print("📝 Falling back to local credentials only...")
+                    key_vault_url = None
+                
+                # Create local credentials for development
+                self.create_local_credentials_file(storage_connection, vision_info)
+                
+                upload_future.result()
             
             # Update configuration
             if key_vault_url:
@@ -456,11 +742,11 @@ vision_key={vision_info["key"]}
             print("🎉 DEPLOYMENT COMPLETED SUCCESSFULLY!")
             print("="*60)
             print(f"📦 Resource Group: {self.resource_group}")
-            print(f"💾 Storage Account: {self.resource_names['storage_account']}")
-            print(f"👁️  AI Vision: {self.resource_names['ai_vision']}")
+            print(f"💾 Storage Account: {self.storage_name}")
+            print(f"👁️  AI Vision: {self.vision_name}")
             
             if key_vault_url:
-                print(f"🔐 Key Vault: {self.resource_names['key_vault']}")
+                print(f"🔐 Key Vault: {self.kv_name}")
                 print(f"🔗 Key Vault URL: {key_vault_url}")
                 print()
             print("🐳 Ready to run with Docker:")
@@ -472,9 +758,9 @@ vision_key={vision_info["key"]}
             
             result = {
                 "resource_group": self.resource_group,
-                "storage_account": self.resource_names['storage_account'],
-                "ai_vision": self.resource_names['ai_vision'],
-                "key_vault": self.resource_names['key_vault']
+                "storage_account": self.storage_name,
+                "ai_vision": self.vision_name,
+                "key_vault": self.kv_name
             }
             
             if key_vault_url:
@@ -528,15 +814,15 @@ if __name__ == "__main__":
 ✅ Graceful fallback to local credentials
 
 ⏳ TIMING & RELIABILITY:
-✅ Proper wait times for resource propagation
+✅ Active polling for resource propagation
 ✅ Retry logic for secret storage
-✅ Batch upload for large image sets
+✅ Concurrent upload for large image sets
 ✅ Error handling with graceful degradation
 
 📦 COMPREHENSIVE SETUP:
 ✅ Creates all Azure resources
 ✅ Handles both RBAC and legacy Key Vault permissions
-✅ Uploads sample images in batches
+✅ Uploads sample images concurrently
 ✅ Creates both Key Vault and local credentials
 ✅ Updates configuration with deployment info
 
@@ -4,12 +4,47 @@ Deploys the analyzer as a containerized application with Azure Container Registr
 This script assumes you already have Azure resources created by deploy_azure_resources.py
 """
 
-import json
 import argparse
 import subprocess
 import os
 import time
-from typing import Dict, Any
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from functools import cached_property
+from typing import TYPE_CHECKING, Dict, Any, List, Optional
+
+import orjson
+import requests
+from azure.core.exceptions import ResourceExistsError, ResourceNotFoundError
+
+from deploy_azure_resources import AZ_CLI, AZ_ENV, FAST_LRO_POLLING_INTERVAL, get_azure_credential, write_file_atomic
+
+# azure.mgmt.* packages are large; they're imported where first used so
+# `--help` and argument errors stay fast
+if TYPE_CHECKING:
+    from azure.core.pipeline.transport import RequestsTransport
+    from azure.mgmt.appcontainers import ContainerAppsAPIClient
+    from azure.mgmt.authorization import AuthorizationManagementClient
+    from azure.mgmt.containerregistry import ContainerRegistryManagementClient
+    from azure.mgmt.loganalytics import LogAnalyticsManagementClient
+
+# Built-in "Key Vault Secrets User" role definition
+KEY_VAULT_SECRETS_USER_ROLE_ID = "4633458b-17de-408a-b874-0445c86b69e6"
+
+# Seconds a successful check_prerequisites is trusted for repeat runs
+PREREQ_CACHE_TTL = 300
+
+# Resource names deploy_container_app.py needs from the earlier deployment
+REQUIRED_RESOURCE_NAMES = ("storage_account", "key_vault")
+
+
+@dataclass(slots=True)
+class DeploymentInfo:
+    """The parts of config.json's deployment_info used here, written by deploy_azure_resources.py"""
+    resource_names: Dict[str, str]
+    key_vault_url: str = ""
+
 
 class ContainerDeployer:
     def __init__(self, resource_group: str, location: str = "eastus", config_file: str = "config.json"):
@@ -21,7 +56,11 @@ class ContainerDeployer:
         self.config = self._load_config()
         
         # Generate container-specific resource names
-        self.deployment_info = self.config.get("deployment_info", {})
+        deployment_info = self.config["deployment_info"]
+        self.deployment_info = DeploymentInfo(
+            resource_names=deployment_info["resource_names"],
+            key_vault_url=deployment_info.get("key_vault_url", "")
+        )
         self.suffix = self._extract_suffix_from_deployment()
         
         self.container_resources = {
@@ -30,6 +69,15 @@ class ContainerDeployer:
             "container_app_name": f"ai-analyzer-app-{self.suffix}",
             "log_analytics_name": f"ai-analyzer-logs-{self.suffix}"
         }
+        
+        # Filled in by check_prerequisites (or on first use) to avoid repeat CLI calls
+        self._subscription_id: Optional[str] = None
+        
+        # Management clients share the credential (and its token cache) with deploy_azure_resources.py
+        self.credential = get_azure_credential()
+        
+        # HTTP sessions behind the management clients, closed by close()
+        self._arm_sessions: List[requests.Session] = []
 
     def _load_config(self) -> Dict[str, Any]:
         """Load existing configuration file"""
@@ -38,75 +86,145 @@ class ContainerDeployer:
             print("Please run deploy_azure_resources.py first to create Azure resources.")
             exit(1)
         
-        with open(self.config_file, 'r') as f:
-            config = json.load(f)
+        with open(self.config_file, 'rb') as f:
+            config = orjson.loads(f.read())
         
         if "deployment_info" not in config:
             print("❌ No deployment info found in config.json!")
             print("Please run deploy_azure_resources.py first to create Azure resources.")
             exit(1)
+        
+        # Fail now rather than after the registry and image are already built
+        resource_names = config["deployment_info"].get("resource_names", {})
+        missing = [name for name in REQUIRED_RESOURCE_NAMES if name not in resource_names]
+        if missing:
+            print(f"❌ Deployment info in config.json is missing: {', '.join(missing)}")
+            print("Please run deploy_azure_resources.py first to create Azure resources.")
+            exit(1)
             
         return config
 
     def _extract_suffix_from_deployment(self) -> str:
         """Extract the suffix from existing deployment"""
-        resource_names = self.deployment_info.get("resource_names", {})
-        storage_account = resource_names.get("storage_account", "")
+        storage_account = self.deployment_info.resource_names["storage_account"]
         
         # Extract suffix from storage account name (e.g., aianalyzer0ca92c -> 0ca92c)
         if storage_account.startswith("aianalyzer"):
             return storage_account[len("aianalyzer"):]
         else:
             # Fallback: generate new suffix
-            import random
-            import string
-            return ''.join(random.choices(string.ascii_lowercase + string.digits, k=6))
+            return os.urandom(3).hex()
 
-    def _run_az_command(self, command: str, capture_output: bool = True) -> str:
-        """Run Azure CLI command and return output"""
+    def _run_az_command(self, args: List[str], capture_output: bool = True) -> bytes:
+        """Run `az <args>` and return its raw output, which callers hand straight to orjson"""
         try:
-            print(f"   Running: {command}")
+            print(f"   Running: az {' '.join(args)}")
             if capture_output:
                 result = subprocess.run(
-                    command, 
-                    shell=True, 
+                    [AZ_CLI, *args], 
+                    env=AZ_ENV, 
                     check=True, 
-                    capture_output=True, 
-                    text=True
+                    capture_output=True
                 )
                 return result.stdout.strip()
             else:
-                subprocess.run(command, shell=True, check=True)
-                return ""
+                subprocess.run([AZ_CLI, *args], env=AZ_ENV, check=True)
+                return b""
                 
         except subprocess.CalledProcessError as e:
             print(f"   ❌ Command failed: {e}")
             if capture_output and e.stderr:
-                print(f"   Error output: {e.stderr}")
+                print(f"   Error output: {e.stderr.decode(errors='replace')}")
             raise
 
+    def _arm_transport(self) -> "RequestsTransport":
+        """
+        Transport for one management client, backed by its own session
+        
+        The registry and workspace/environment chains drive their clients from
+        different threads at once, and requests.Session isn't documented as
+        thread-safe, so sessions are not shared between clients. Each cached
+        client still reuses its session's pooled connections across calls.
+        """
+        from azure.core.pipeline.transport import RequestsTransport
+        session = requests.Session()
+        self._arm_sessions.append(session)
+        return RequestsTransport(session=session, session_owner=False)
+
+    def close(self):
+        """Close the management clients' HTTP sessions"""
+        for session in self._arm_sessions:
+            session.close()
+        self._arm_sessions.clear()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    @cached_property
+    def registry_client(self) -> "ContainerRegistryManagementClient":
+        from azure.mgmt.containerregistry import ContainerRegistryManagementClient
+        return ContainerRegistryManagementClient(self.credential, self._get_subscription_id(), transport=self._arm_transport())
+
+    @cached_property
+    def log_analytics_client(self) -> "LogAnalyticsManagementClient":
+        from azure.mgmt.loganalytics import LogAnalyticsManagementClient
+        return LogAnalyticsManagementClient(self.credential, self._get_subscription_id(), transport=self._arm_transport())
+
+    @cached_property
+    def container_apps_client(self) -> "ContainerAppsAPIClient":
+        from azure.mgmt.appcontainers import ContainerAppsAPIClient
+        return ContainerAppsAPIClient(self.credential, self._get_subscription_id(), transport=self._arm_transport())
+
+    @cached_property
+    def authorization_client(self) -> "AuthorizationManagementClient":
+        from azure.mgmt.authorization import AuthorizationManagementClient
+        return AuthorizationManagementClient(self.credential, self._get_subscription_id(), transport=self._arm_transport())
+
     def check_prerequisites(self) -> bool:
         """Check if all prerequisites are met"""
         print("🔍 Checking prerequisites...")
         
-        # Check Azure CLI
+        # A recent successful check for the same resource group is reused, which
+        # skips three az processes on quick re-runs
+        sentinel = f"{self.config_file}.prereq_ok"
         try:
-            self._run_az_command("az version")
-        except:
-            print("❌ Azure CLI not found!")
+            if time.time() - os.path.getmtime(sentinel) < PREREQ_CACHE_TTL:
+                with open(sentinel, 'rb') as f:
+                    cached = orjson.loads(f.read())
+                if cached.get("resource_group") == self.resource_group:
+                    self._subscription_id = cached["subscription_id"]
+                    print("✅ All prerequisites met (checked recently)")
+                    return True
+        except (OSError, orjson.JSONDecodeError, KeyError):
+            pass
+        
+        if not self._check_prerequisites():
+            try:
+                os.remove(sentinel)
+            except FileNotFoundError:
+                pass
             return False
         
-        # Check Docker
+        write_file_atomic(sentinel, orjson.dumps({"resource_group": self.resource_group, "subscription_id": self._subscription_id}))
+        print("✅ All prerequisites met")
+        return True
+
+    def _check_prerequisites(self) -> bool:
+        """Run the prerequisite checks against Azure"""
+        # Check Azure CLI
         try:
-            subprocess.run("docker --version", shell=True, check=True, capture_output=True)
+            self._run_az_command(["version"])
         except:
-            print("❌ Docker not found!")
-            print("Please install Docker: https://docs.docker.com/get-docker/")
+            print("❌ Azure CLI not found!")
             return False
         
         # Check if logged in to Azure
         try:
-            self._run_az_command("az account show")
+            account = orjson.loads(self._run_az_command(["account", "show"]))
+            self._subscription_id = account["id"]
         except:
             print("❌ Not logged in to Azure!")
             print("Please run: az login")
@@ -114,56 +232,79 @@ class ContainerDeployer:
         
         # Check if Azure resources exist
         try:
-            storage_account = self.deployment_info["resource_names"]["storage_account"]
-            self._run_az_command(f"az storage account show --name {storage_account} --resource-group {self.resource_group}")
+            storage_account = self.deployment_info.resource_names["storage_account"]
+            self._run_az_command(["storage", "account", "show", "--name", storage_account, "--resource-group", self.resource_group])
         except:
             print("❌ Azure resources not found!")
             print("Please run deploy_azure_resources.py first.")
             return False
         
-        print("✅ All prerequisites met")
         return True
 
+    def check_name_availability(self) -> bool:
+        """Check that the globally unique registry name is free (or already ours) before creating anything"""
+        registry_name = self.container_resources["registry_name"]
+        
+        from azure.mgmt.containerregistry.models import RegistryNameCheckRequest
+        
+        status = self.registry_client.registries.check_name_availability(RegistryNameCheckRequest(name=registry_name))
+        if status.name_available:
+            return True
+        
+        # A taken name is fine when it's this resource group's registry from an earlier run
+        try:
+            self.registry_client.registries.get(self.resource_group, registry_name)
+            return True
+        except ResourceNotFoundError:
+            print(f"❌ Container Registry name '{registry_name}' is not available: {status.message}")
+            return False
+
+    def _existing(self, get, name: str):
+        """Resource from an earlier run, or None if it doesn't exist or didn't finish provisioning"""
+        try:
+            resource = get(self.resource_group, name)
+        except ResourceNotFoundError:
+            return None
+        if resource.provisioning_state != "Succeeded":
+            return None
+        print(f"   ♻️  {name} already exists, skipping create")
+        return resource
+
     def create_container_registry(self) -> str:
         """Create Azure Container Registry"""
         registry_name = self.container_resources["registry_name"]
         print(f"📦 Creating Azure Container Registry: {registry_name}")
         
-        # Create ACR
-        command = f"""az acr create 
-            --resource-group {self.resource_group} 
-            --name {registry_name} 
-            --sku Basic 
-            --location {self.location}
-            --admin-enabled true""".replace('\n', ' ')
-        
-        self._run_az_command(command)
+        from azure.mgmt.containerregistry.models import Registry, Sku as RegistrySku
         
-        # Get login server
-        login_server = self._run_az_command(f"az acr show --name {registry_name} --resource-group {self.resource_group} --query loginServer -o tsv")
+        # Create ACR unless an earlier run already did; either way the registry carries its login server
+        registry = self._existing(self.registry_client.registries.get, registry_name)
+        if registry is None:
+            registry = self.registry_client.registries.begin_create(
+                self.resource_group,
+                registry_name,
+                Registry(location=self.location, sku=RegistrySku(name="Basic"), admin_user_enabled=True),
+                polling_interval=FAST_LRO_POLLING_INTERVAL
+            ).result()
+        login_server = registry.login_server
         
         print(f"✅ Container Registry created: {login_server}")
         return login_server
 
     def build_and_push_image(self, registry_login_server: str) -> str:
-        """Build Docker image and push to ACR"""
+        """Build Docker image in ACR and push it to the registry"""
         image_name = "azure-ai-image-analyzer"
         image_tag = "latest"
         full_image_name = f"{registry_login_server}/{image_name}:{image_tag}"
         
         print(f"🐳 Building Docker image: {full_image_name}")
         
-        # Login to ACR
+        # ACR Tasks builds server-side from the uploaded context, so no local
+        # Docker daemon is needed and only the context tarball crosses the wire
         registry_name = self.container_resources["registry_name"]
-        self._run_az_command(f"az acr login --name {registry_name}")
-        
-        # Build image
-        print("   🔨 Building Docker image...")
-        self._run_az_command(f"docker build -t {full_image_name} .", capture_output=False)
-        
-        # Push image
-        print("   📤 Pushing image to registry...")
-        self._run_az_command(f"docker push {full_image_name}", capture_output=False)
+        print("   🔨 Building image in Azure Container Registry...")
+        self._run_az_command(["acr", "build", "--registry", registry_name, "--image", f"{image_name}:{image_tag}",
+                              "--file", "Dockerfile", "."], capture_output=False)
         
         print(f"✅ Image pushed: {full_image_name}")
         return full_image_name
@@ -173,115 +314,142 @@ class ContainerDeployer:
         workspace_name = self.container_resources["log_analytics_name"]
         print(f"📊 Creating Log Analytics workspace: {workspace_name}")
         
-        # Create workspace
-        command = f"""az monitor log-analytics workspace create 
-            --resource-group {self.resource_group} 
-            --workspace-name {workspace_name} 
-            --location {self.location}""".replace('\n', ' ')
+        from azure.mgmt.loganalytics.models import Workspace, WorkspaceSku
         
-        self._run_az_command(command)
+        # Create workspace unless an earlier run already did
+        workspace = self._existing(self.log_analytics_client.workspaces.get, workspace_name)
+        if workspace is None:
+            workspace = self.log_analytics_client.workspaces.begin_create_or_update(
+                self.resource_group,
+                workspace_name,
+                Workspace(location=self.location, sku=WorkspaceSku(name="PerGB2018")),
+                polling_interval=FAST_LRO_POLLING_INTERVAL
+            ).result()
+        workspace_id = workspace.customer_id
         
-        # Get workspace ID and key
-        workspace_id = self._run_az_command(f"""az monitor log-analytics workspace show 
-            --resource-group {self.resource_group} 
-            --workspace-name {workspace_name} 
-            --query customerId -o tsv""".replace('\n', ' '))
-        
-        workspace_key = self._run_az_command(f"""az monitor log-analytics workspace get-shared-keys 
-            --resource-group {self.resource_group} 
-            --workspace-name {workspace_name} 
-            --query primarySharedKey -o tsv""".replace('\n', ' '))
+        # Get workspace key
+        workspace_key = self.log_analytics_client.shared_keys.get_shared_keys(
+            self.resource_group, workspace_name).primary_shared_key
         
         print(f"✅ Log Analytics workspace created")
         return workspace_id, workspace_key
 
     def create_container_environment(self, workspace_id: str, workspace_key: str) -> str:
-        """Create Container Apps environment"""
+        """Create Container Apps environment and return its resource ID"""
         env_name = self.container_resources["container_env_name"]
         print(f"🌐 Creating Container Apps environment: {env_name}")
         
-        # Create environment
-        command = f"""az containerapp env create 
-            --name {env_name} 
-            --resource-group {self.resource_group} 
-            --location {self.location}
-            --logs-workspace-id {workspace_id}
-            --logs-workspace-key {workspace_key}""".replace('\n', ' ')
-        
-        self._run_az_command(command)
+        from azure.mgmt.appcontainers.models import AppLogsConfiguration, LogAnalyticsConfiguration, ManagedEnvironment
+        
+        # Create environment unless an earlier run already did
+        environment = self._existing(self.container_apps_client.managed_environments.get, env_name)
+        if environment is None:
+            environment = self.container_apps_client.managed_environments.begin_create_or_update(
+                self.resource_group,
+                env_name,
+                ManagedEnvironment(
+                    location=self.location,
+                    app_logs_configuration=AppLogsConfiguration(
+                        destination="log-analytics",
+                        log_analytics_configuration=LogAnalyticsConfiguration(customer_id=workspace_id, shared_key=workspace_key)
+                    )
+                )
+            ).result()
         
         print(f"✅ Container Apps environment created: {env_name}")
-        return env_name
+        return environment.id
 
-    def create_container_app(self, image_name: str, environment_name: str) -> str:
+    def create_container_app(self, image_name: str, environment_id: str) -> str:
         """Create Container App with the analyzer"""
         app_name = self.container_resources["container_app_name"]
         registry_name = self.container_resources["registry_name"]
-        key_vault_url = self.deployment_info.get("key_vault_url", "")
+        key_vault_url = self.deployment_info.key_vault_url
         
         print(f"🚀 Creating Container App: {app_name}")
         
+        from azure.mgmt.appcontainers.models import (
+            Configuration, Container, ContainerApp, ContainerResources, EnvironmentVar,
+            Ingress, ManagedServiceIdentity, RegistryCredentials, Scale, Secret, Template
+        )
+        
         # Get ACR credentials
-        acr_username = self._run_az_command(f"az acr credential show --name {registry_name} --query username -o tsv")
-        acr_password = self._run_az_command(f"az acr credential show --name {registry_name} --query passwords[0].value -o tsv")
-        
-        # Create container app
-        command = f"""az containerapp create 
-            --name {app_name} 
-            --resource-group {self.resource_group} 
-            --environment {environment_name} 
-            --image {image_name}
-            --registry-server {image_name.split('/')[0]}
-            --registry-username {acr_username}
-            --registry-password {acr_password}
-            --env-vars CREDENTIAL_METHOD=keyvault KEY_VAULT_URL='{key_vault_url}'
-            --cpu 1.0 
-            --memory 2.0Gi
-            --min-replicas 0
-            --max-replicas 3
-            --ingress external 
-            --target-port 8000""".replace('\n', ' ')
-        
-        self._run_az_command(command)
-        
-        # Get app URL
-        app_url = self._run_az_command(f"""az containerapp show 
-            --name {app_name} 
-            --resource-group {self.resource_group} 
-            --query properties.configuration.ingress.fqdn -o tsv""".replace('\n', ' '))
+        acr_credentials = self.registry_client.registries.list_credentials(self.resource_group, registry_name)
+        
+        # Create container app; the system-assigned identity is created with it
+        # so assign_managed_identity only has to grant it Key Vault access
+        app = self.container_apps_client.container_apps.begin_create_or_update(
+            self.resource_group,
+            app_name,
+            ContainerApp(
+                location=self.location,
+                identity=ManagedServiceIdentity(type="SystemAssigned"),
+                managed_environment_id=environment_id,
+                configuration=Configuration(
+                    secrets=[Secret(name="registry-password", value=acr_credentials.passwords[0].value)],
+                    registries=[RegistryCredentials(
+                        server=image_name.split('/')[0],
+                        username=acr_credentials.username,
+                        password_secret_ref="registry-password"
+                    )],
+                    ingress=Ingress(external=True, target_port=8000)
+                ),
+                template=Template(
+                    containers=[Container(
+                        name=app_name,
+                        image=image_name,
+                        env=[
+                            EnvironmentVar(name="CREDENTIAL_METHOD", value="keyvault"),
+                            EnvironmentVar(name="KEY_VAULT_URL", value=key_vault_url)
+                        ],
+                        resources=ContainerResources(cpu=1.0, memory="2Gi")
+                    )],
+                    scale=Scale(min_replicas=0, max_replicas=3)
+                )
+            )
+        ).result()
+        app_url = app.configuration.ingress.fqdn
         
         print(f"✅ Container App created: https://{app_url}")
         return f"https://{app_url}"
 
     def assign_managed_identity(self, app_name: str):
-        """Assign managed identity and Key Vault permissions"""
+        """Assign Key Vault permissions to the app's managed identity"""
         print("🔐 Setting up managed identity and permissions...")
         
-        # Enable managed identity
-        identity_result = self._run_az_command(f"""az containerapp identity assign 
-            --name {app_name} 
-            --resource-group {self.resource_group} 
-            --system-assigned""".replace('\n', ' '))
+        from azure.mgmt.authorization.models import RoleAssignmentCreateParameters
         
-        # Extract principal ID
-        import json
-        identity_info = json.loads(identity_result)
-        principal_id = identity_info["principalId"]
+        principal_id = self.container_apps_client.container_apps.get(self.resource_group, app_name).identity.principal_id
         
         # Assign Key Vault permissions
-        key_vault_name = self.deployment_info["resource_names"]["key_vault"]
+        key_vault_name = self.deployment_info.resource_names["key_vault"]
         kv_resource_id = f"/subscriptions/{self._get_subscription_id()}/resourceGroups/{self.resource_group}/providers/Microsoft.KeyVault/vaults/{key_vault_name}"
         
-        self._run_az_command(f"""az role assignment create 
-            --assignee {principal_id} 
-            --role "Key Vault Secrets User" 
-            --scope {kv_resource_id}""".replace('\n', ' '))
+        # The name is derived from scope, principal and role so a re-deploy targets the
+        # same assignment. principal_type lets ARM accept it before the new identity
+        # has replicated through Entra ID
+        assignment_name = str(uuid.uuid5(uuid.NAMESPACE_URL, f"{kv_resource_id}|{principal_id}|{KEY_VAULT_SECRETS_USER_ROLE_ID}"))
+        try:
+            self.authorization_client.role_assignments.create(
+                kv_resource_id,
+                assignment_name,
+                RoleAssignmentCreateParameters(
+                    role_definition_id=(f"/subscriptions/{self._get_subscription_id()}/providers/"
+                                        f"Microsoft.Authorization/roleDefinitions/{KEY_VAULT_SECRETS_USER_ROLE_ID}"),
+                    principal_id=principal_id,
+                    principal_type="ServicePrincipal"
+                )
+            )
+        except ResourceExistsError:
+            # RoleAssignmentExists: granted by an earlier deploy (possibly under another name)
+            print("ℹ️  Key Vault role assignment already exists")
         
         print("✅ Managed identity and permissions configured")
 
     def _get_subscription_id(self) -> str:
         """Get current subscription ID"""
-        return self._run_az_command("az account show --query id -o tsv")
+        if self._subscription_id is None:
+            self._subscription_id = orjson.loads(self._run_az_command(["account", "show", "--query", "id"]))
+        return self._subscription_id
 
     def update_config_with_container_info(self, app_url: str):
         """Update configuration with container deployment info"""
@@ -301,8 +469,7 @@ class ContainerDeployer:
         }
         
         # Save updated config
-        with open(self.config_file, 'w') as f:
-            json.dump(self.config, f, indent=2)
+        write_file_atomic(self.config_file, orjson.dumps(self.config, option=orjson.OPT_INDENT_2))
         
         print(f"✅ Configuration updated: {self.config_file}")
 
@@ -318,20 +485,26 @@ class ContainerDeployer:
             return {}
         
         try:
-            # Step 1: Create Container Registry
-            registry_login_server = self.create_container_registry()
-            
-            # Step 2: Build and push Docker image
-            image_name = self.build_and_push_image(registry_login_server)
+            # Registry names are global, so a collision would otherwise surface only
+            # after the workspace and environment are under way
+            if not self.check_name_availability():
+                return {}
             
-            # Step 3: Create Log Analytics workspace
-            workspace_id, workspace_key = self.create_log_analytics_workspace()
-            
-            # Step 4: Create Container Apps environment
-            environment_name = self.create_container_environment(workspace_id, workspace_key)
+            # Steps 1-4: the registry/image and workspace/environment chains don't
+            # depend on each other, so run them side by side
+            with ThreadPoolExecutor(max_workers=4) as executor:
+                registry_future = executor.submit(self.create_container_registry)
+                workspace_future = executor.submit(self.create_log_analytics_workspace)
+                
+                # Image build only needs the registry, so it runs while the
+                # workspace and environment are still being created
+                image_future = executor.submit(self.build_and_push_image, registry_future.result())
+                workspace_id, workspace_key = workspace_future.result()
+                environment_id = self.create_container_environment(workspace_id, workspace_key)
+                image_name = image_future.result()
             
             # Step 5: Create Container App
-            app_url = self.create_container_app(image_name, environment_name)
+            app_url = self.create_container_app(image_name, environment_id)
             
             # Step 6: Setup managed identity and permissions
             self.assign_managed_identity(self.container_resources["container_app_name"])
@@ -381,19 +554,18 @@ def main():
     print("🐳 Azure AI Image Analyzer - Container Deployment")
     print("This script will create:")
     print("  • Azure Container Registry")
-    print("  • Build and push Docker image") 
+    print("  • Build Docker image in the registry")
     print("  • Create Container Apps environment")
     print("  • Deploy as scalable Container App")
     print("  • Configure managed identity and permissions")
     print()
     
-    deployer = ContainerDeployer(
+    with ContainerDeployer(
         resource_group=args.resource_group,
         location=args.location,
         config_file=args.config
-    )
-    
-    result = deployer.deploy_container_app()
+    ) as deployer:
+        result = deployer.deploy_container_app()
     
     if result:
         print(f"\n✅ Container deployment successful!")
@@ -412,8 +584,8 @@ if __name__ == "__main__":
 
 📦 CONTAINER REGISTRY:
 ✅ Creates Azure Container Registry with admin access
-✅ Builds Docker image locally
-✅ Pushes to private registry with authentication
+✅ Builds Docker image in the registry with ACR Tasks
+✅ No local Docker daemon required
 
 🚀 CONTAINER APPS:
 ✅ Creates Log Analytics workspace for monitoring
@@ -61,17 +61,17 @@ try {
 
 Write-Host "✅ Python found: $pythonCmd" -ForegroundColor Green
 
-# Install dependencies if requirements.txt exists
-if (Test-Path "requirements.txt") {
+# Install dependencies (runtime plus deployment SDKs) if requirements-deploy.txt exists
+if (Test-Path "requirements-deploy.txt") {
     Write-Host "📦 Installing Python dependencies..." -ForegroundColor Yellow
     try {
-        & $pythonCmd -m pip install -r requirements.txt
+        & $pythonCmd -m pip install -r requirements-deploy.txt
         Write-Host "✅ Dependencies installed" -ForegroundColor Green
     } catch {
         Write-Host "⚠️  Warning: Could not install some dependencies" -ForegroundColor Yellow
     }
 } else {
-    Write-Host "⚠️  requirements.txt not found - skipping dependency installation" -ForegroundColor Yellow
+    Write-Host "⚠️  requirements-deploy.txt not found - skipping dependency installation" -ForegroundColor Yellow
 }
 
 Write-Host ""
@@ -44,13 +44,13 @@ fi
 
 echo "✅ Python found: $PYTHON_CMD"
 
-# Install dependencies if requirements.txt exists
-if [ -f "requirements.txt" ]; then
+# Install dependencies (runtime plus deployment SDKs) if requirements-deploy.txt exists
+if [ -f "requirements-deploy.txt" ]; then
     echo "📦 Installing Python dependencies..."
-    $PYTHON_CMD -m pip install -r requirements.txt
+    $PYTHON_CMD -m pip install -r requirements-deploy.txt
     echo "✅ Dependencies installed"
 else
-    echo "⚠️  requirements.txt not found - skipping dependency installation"
+    echo "⚠️  requirements-deploy.txt not found - skipping dependency installation"
 fi
 
 # Set default resource group name
@@ -3,25 +3,48 @@ Web Interface for Azure AI Image Analyzer Container App
 Provides a simple web UI for triggering analysis and viewing results
 """
 
+import asyncio
+import hashlib
+import itertools
 import os
-import json
-import subprocess
-import glob
+import sys
+import gzip
+import time
+import zlib
+from collections import deque
+from contextlib import asynccontextmanager
 from datetime import datetime
-from fastapi import FastAPI, BackgroundTasks
-from fastapi.responses import HTMLResponse, JSONResponse
+from pathlib import Path
+from typing import Any, Deque, Dict, Optional, Tuple
+
+import ijson
+import orjson
+from fastapi import FastAPI, BackgroundTasks, Request
+from fastapi.responses import HTMLResponse, JSONResponse, Response, StreamingResponse
 import uvicorn
 
+class OrjsonResponse(JSONResponse):
+    """JSON response serialized by orjson instead of the stdlib json module"""
+    
+    def render(self, content: Any) -> bytes:
+        return orjson.dumps(content)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Load config.json before the first request; /status then only re-reads it after a change"""
+    await _config_info()
+    yield
+
 app = FastAPI(
     title="Azure AI Image Analyzer", 
     description="Containerized AI Image Analysis with Web Interface",
-    version="3.0.0"
+    version="3.0.0",
+    default_response_class=OrjsonResponse,
+    lifespan=lifespan
 )
 
-@app.get("/", response_class=HTMLResponse)
-async def root():
-    """Main web interface"""
-    html_content = """<!DOCTYPE html>
+# Main web interface, encoded and hashed once at import
+INDEX_HTML = """<!DOCTYPE html>
 <html>
 <head>
     <title>Azure AI Image Analyzer</title>
@@ -35,6 +58,7 @@ async def root():
         .button-group { margin: 20px 0; }
         button { background: #0078d4; color: white; border: none; padding: 12px 24px; margin: 8px; border-radius: 5px; cursor: pointer; font-size: 14px; transition: background 0.3s; }
         button:hover { background: #106ebe; }
+        button:disabled { background: #8a8886; cursor: not-allowed; }
         button.secondary { background: #107c10; }
         button.secondary:hover { background: #0e6e0e; }
         button.tertiary { background: #5c2d91; }
@@ -77,7 +101,7 @@ async def root():
         
         <h3>🚀 Actions:</h3>
         <div class="button-group">
-            <button onclick="runAnalysis()">🔍 Run Full Analysis</button>
+            <button id="run-analysis" onclick="runAnalysis()">🔍 Run Full Analysis</button>
             <button class="secondary" onclick="getStatus()">📊 System Status</button>
             <button class="tertiary" onclick="getResults()">📋 View Latest Results</button>
             <button class="secondary" onclick="clearOutput()">🗑️ Clear Output</button>
@@ -105,6 +129,9 @@ System ready for operation...</div>
                 if (result.status === 'success') {
                     output.className = 'success';
                     output.innerHTML = `✅ Analysis completed successfully!\\n\\n${result.message}\\n\\nOutput preview:\\n${result.output}\\n\\nTimestamp: ${result.timestamp}`;
+                } else if (result.status === 'already_running') {
+                    output.className = 'loading';
+                    output.innerHTML = `⏳ ${result.message} (started ${result.started}).\\n\\nResults will be available once it finishes.`;
                 } else {
                     output.className = 'error';
                     output.innerHTML = `❌ Analysis failed:\\n\\n${result.message}\\n\\nError details:\\n${result.error || 'No additional details'}\\n\\nOutput:\\n${result.output || 'No output'}`;
@@ -121,10 +148,15 @@ System ready for operation...</div>
             output.className = 'loading';
             
             try {
-                const response = await fetch('/status');
+                // One round-trip for health, status and the latest results summary
+                const response = await fetch('/state');
                 const result = await response.json();
+                const latest = result.latest_results;
+                const latestLine = latest.file
+                    ? `${latest.file} (${latest.total_detailed_results} images, ${latest.file_size_mb} MB)`
+                    : latest.message;
                 output.className = 'success';
-                output.innerHTML = `📊 System Status Report:\\n\\n${JSON.stringify(result, null, 2)}`;
+                output.innerHTML = `📊 System Status Report:\\n\\n${JSON.stringify(result.status, null, 2)}\\n\\nHealth: ${result.health.status}\\nLatest results: ${latestLine}`;
             } catch (error) {
                 output.className = 'error';
                 output.innerHTML = `❌ Error getting status: ${error.message}`;
@@ -162,52 +194,150 @@ System ready for operation...</div>
             output.innerHTML = 'Output cleared. Ready for new operations...';
         }
         
-        setInterval(async () => {
-            try {
-                const response = await fetch('/health');
-                const result = await response.json();
-                if (result.status !== 'healthy') {
-                    console.warn('Health check failed:', result);
-                }
-            } catch (error) {
-                console.warn('Health check error:', error);
+        // One long-lived stream per tab; the server pushes when health changes or an
+        // analysis (from any tab) starts or finishes
+        const healthStream = new EventSource('/health/stream');
+        healthStream.onmessage = (event) => {
+            const result = JSON.parse(event.data);
+            if (result.status !== 'healthy') {
+                console.warn('Health check failed:', result);
             }
-        }, 30000);
+            const runButton = document.getElementById('run-analysis');
+            runButton.disabled = result.analysis.running;
+            runButton.textContent = result.analysis.running
+                ? `⏳ Analysis running since ${result.analysis.started}`
+                : '🔍 Run Full Analysis';
+        };
+        healthStream.onerror = (error) => {
+            console.warn('Health check error:', error);
+        };
     </script>
 </body>
 </html>"""
-    return html_content
+INDEX_HTML_BYTES = INDEX_HTML.encode("utf-8")
+INDEX_ETAG = f'"{hashlib.sha256(INDEX_HTML_BYTES).hexdigest()[:16]}"'
+# Compressed once here rather than per request; the gzip copy gets its own ETag
+# since it is a different representation of the page
+INDEX_HTML_GZIP = gzip.compress(INDEX_HTML_BYTES, compresslevel=9, mtime=0)
+INDEX_GZIP_ETAG = INDEX_ETAG[:-1] + '-gzip"'
 
-@app.get("/health")
-async def health_check():
-    """Health check endpoint"""
+def _accepts_gzip(request: Request) -> bool:
+    """Whether Accept-Encoding allows gzip; an explicit gzip entry takes precedence over *"""
+    qualities: Dict[str, float] = {}
+    for coding in request.headers.get("accept-encoding", "").split(","):
+        name, *params = coding.split(";")
+        quality = 1.0
+        for param in params:
+            key, _, value = param.partition("=")
+            if key.strip().lower() == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        qualities.setdefault(name.strip().lower(), quality)
+    return qualities.get("gzip", qualities.get("*", 0.0)) > 0
+
+@app.get("/", response_class=HTMLResponse)
+async def root(request: Request):
+    """Main web interface"""
+    # The page never changes while the app runs, so a browser revalidating its
+    # cached copy gets an empty 304 instead of the page again
+    if _accepts_gzip(request):
+        body, headers = INDEX_HTML_GZIP, {"ETag": INDEX_GZIP_ETAG, "Content-Encoding": "gzip"}
+    else:
+        body, headers = INDEX_HTML_BYTES, {"ETag": INDEX_ETAG}
+    headers["Vary"] = "Accept-Encoding"
+    
+    if headers["ETag"] in (tag.strip() for tag in request.headers.get("if-none-match", "").split(",")):
+        headers.pop("Content-Encoding", None)
+        return Response(status_code=304, headers=headers)
+    headers["Cache-Control"] = "no-cache"
+    return Response(body, media_type="text/html; charset=utf-8", headers=headers)
+
+# Response timestamps have one-second resolution, so the formatted string is
+# shared by every response within the same second
+_now_iso_cache: Dict[str, Any] = {"second": None, "iso": ""}
+
+def _now_iso() -> str:
+    """Current local time in ISO format, reformatted at most once per second"""
+    second = int(time.time())
+    if _now_iso_cache["second"] != second:
+        _now_iso_cache["iso"] = datetime.fromtimestamp(second).isoformat()
+        _now_iso_cache["second"] = second
+    return _now_iso_cache["iso"]
+
+def _health() -> Dict[str, Any]:
+    """Current health report"""
     return {
         "status": "healthy", 
         "service": "Azure AI Image Analyzer",
         "version": "3.0.0",
-        "timestamp": datetime.now().isoformat()
+        "analysis": _analysis_state(),
+        "timestamp": _now_iso()
     }
 
-@app.get("/status")
-async def get_status():
-    """Get system status"""
+@app.get("/health")
+async def health_check():
+    """Health check endpoint"""
+    return _health()
+
+# Longest wait between events on /health/stream; with no change in between, a
+# comment line is sent so proxies keep the connection open
+HEALTH_STREAM_INTERVAL = 15
+
+async def _health_events():
+    """Server-sent events: the health report whenever its status or the analysis state changes"""
+    last_state = None
+    while True:
+        # Taken before reading the state so a change in between isn't missed
+        changed = _analysis_changed
+        health = _health()
+        state = (health["status"], health["analysis"]["running"])
+        if state != last_state:
+            last_state = state
+            yield b"data: " + orjson.dumps(health) + b"\n\n"
+        else:
+            yield b": keepalive\n\n"
+        try:
+            await asyncio.wait_for(changed.wait(), timeout=HEALTH_STREAM_INTERVAL)
+        except asyncio.TimeoutError:
+            pass
+
+@app.get("/health/stream")
+async def health_stream():
+    """Health updates for the web interface, pushed instead of polled"""
+    return StreamingResponse(_health_events(), media_type="text/event-stream", headers={"Cache-Control": "no-cache"})
+
+# Parsed summary of config.json, keyed by the file's mtime so /status polls
+# cost one stat() instead of an open and parse
+_config_info_cache: Dict[str, Any] = {"mtime_ns": None, "info": {}}
+
+async def _config_info() -> Dict[str, Any]:
+    """Summary of config.json for /status, re-read only when the file changes"""
+    try:
+        mtime_ns = os.stat("config.json").st_mtime_ns
+    except FileNotFoundError:
+        return {"config_file_exists": False}
+    
+    if _config_info_cache["mtime_ns"] != mtime_ns:
+        try:
+            # The read happens off the event loop, so a slow disk doesn't stall other requests
+            config = orjson.loads(await asyncio.to_thread(Path("config.json").read_bytes))
+            _config_info_cache["info"] = {
+                "deployment_info_exists": "deployment_info" in config,
+                "containers_configured": "containers" in config,
+                "analysis_settings_configured": "analysis_settings" in config
+            }
+            _config_info_cache["mtime_ns"] = mtime_ns
+        except Exception as e:
+            # Not cached, so a half-written file is picked up once it's complete
+            return {"config_file_exists": True, "config_read_error": str(e)}
+    
+    return {"config_file_exists": True, **_config_info_cache["info"]}
+
+async def _status() -> Dict[str, Any]:
+    """Current system status report"""
     try:
-        # Check if config exists and load it
-        config_exists = os.path.exists("config.json")
-        config_info = {}
-        
-        if config_exists:
-            try:
-                with open("config.json", 'r') as f:
-                    config = json.load(f)
-                    config_info = {
-                        "deployment_info_exists": "deployment_info" in config,
-                        "containers_configured": "containers" in config,
-                        "analysis_settings_configured": "analysis_settings" in config
-                    }
-            except Exception as e:
-                config_info = {"config_read_error": str(e)}
-        
         return {
             "status": "running",
             "container_info": {
@@ -215,125 +345,271 @@ async def get_status():
                 "key_vault_url_set": bool(os.getenv("KEY_VAULT_URL")),
                 "port": os.getenv("PORT", "8000")
             },
-            "configuration": {
-                "config_file_exists": config_exists,
-                **config_info
-            },
-            "timestamp": datetime.now().isoformat()
+            "configuration": await _config_info(),
+            "timestamp": _now_iso()
         }
     except Exception as e:
         return {
             "status": "error",
             "message": f"Status check failed: {str(e)}",
-            "timestamp": datetime.now().isoformat()
+            "timestamp": _now_iso()
         }
 
-@app.post("/analyze")
-async def run_analysis():
-    """Run the AI image analysis"""
+@app.get("/status")
+async def get_status():
+    """Get system status"""
+    return await _status()
+
+# The single analysis run in progress, shared by concurrent POSTs to /analyze
+_analysis_lock = asyncio.Lock()
+_current_analysis: Optional[asyncio.Task] = None
+_current_analysis_started: Optional[str] = None
+# Set (and replaced) whenever an analysis starts or finishes, waking /health/stream listeners
+_analysis_changed = asyncio.Event()
+
+def _signal_analysis_change(*_):
+    """Wake everything waiting on the current _analysis_changed event"""
+    global _analysis_changed
+    changed, _analysis_changed = _analysis_changed, asyncio.Event()
+    changed.set()
+
+def _analysis_state() -> Dict[str, Any]:
+    """Whether an analysis is running, and since when"""
+    running = _current_analysis is not None and not _current_analysis.done()
+    return {"running": running, "started": _current_analysis_started if running else None}
+
+# Lines of analyzer output kept per pipe; the responses use at most the last 2000 chars
+ANALYSIS_OUTPUT_TAIL_LINES = 200
+# Longest single output line accepted from the analyzer
+ANALYSIS_LINE_LIMIT = 1024 * 1024
+
+# Unbuffered so output reaches the tail as it is printed; no .pyc writes from a
+# one-shot run (the Docker image sets both already, this covers local runs)
+ANALYZER_ENV = {**os.environ, "PYTHONUNBUFFERED": "1", "PYTHONDONTWRITEBYTECODE": "1"}
+
+async def _tail(stream: asyncio.StreamReader, lines: Deque[bytes]) -> None:
+    """Read a pipe to EOF, keeping only its last lines"""
+    async for line in stream:
+        lines.append(line)
+
+async def _run_analyzer() -> Dict[str, Any]:
+    """Run azure_ai_image_analyzer.py once and report the outcome"""
     try:
-        print("Starting analysis...")
-        
-        # Run the analyzer
-        result = subprocess.run(
-            ["python", "azure_ai_image_analyzer.py"], 
-            capture_output=True, 
-            text=True, 
-            timeout=900  # 15 minute timeout
+        # Run the analyzer as an asyncio subprocess so the event loop keeps serving
+        # other requests (including /health probes) while it works
+        proc = await asyncio.create_subprocess_exec(
+            sys.executable, "azure_ai_image_analyzer.py",
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE,
+            limit=ANALYSIS_LINE_LIMIT,
+            env=ANALYZER_ENV
         )
+        # Only the end of the output is returned, so keep a rolling tail of each
+        # pipe instead of buffering the whole run
+        stdout_tail: Deque[bytes] = deque(maxlen=ANALYSIS_OUTPUT_TAIL_LINES)
+        stderr_tail: Deque[bytes] = deque(maxlen=ANALYSIS_OUTPUT_TAIL_LINES)
+        try:
+            await asyncio.wait_for(
+                asyncio.gather(_tail(proc.stdout, stdout_tail), _tail(proc.stderr, stderr_tail), proc.wait()),
+                timeout=900  # 15 minute timeout
+            )
+        finally:
+            # Timed out, or a pipe could not be read (e.g. a line over ANALYSIS_LINE_LIMIT):
+            # nothing drains the pipes any more, so don't leave the analyzer blocked on them
+            if proc.returncode is None:
+                try:
+                    proc.kill()
+                except ProcessLookupError:
+                    pass
+                await proc.wait()
+        stdout = b"".join(stdout_tail).decode(errors="replace")
+        stderr = b"".join(stderr_tail).decode(errors="replace")
         
-        timestamp = datetime.now().isoformat()
+        timestamp = _now_iso()
         
-        if result.returncode == 0:
+        if proc.returncode == 0:
             return {
                 "status": "success",
                 "message": "Image analysis completed successfully! Check Azure Blob Storage for detailed results.",
-                "output": result.stdout[-2000:],  # Last 2000 chars
+                "output": stdout[-2000:],  # Last 2000 chars
                 "timestamp": timestamp,
-                "exit_code": result.returncode
+                "exit_code": proc.returncode
             }
         else:
             return {
                 "status": "error", 
                 "message": "Analysis process failed",
-                "error": result.stderr[-1500:] if result.stderr else "No error details",
-                "output": result.stdout[-1500:] if result.stdout else "No output",
+                "error": stderr[-1500:] if stderr else "No error details",
+                "output": stdout[-1500:] if stdout else "No output",
                 "timestamp": timestamp,
-                "exit_code": result.returncode
+                "exit_code": proc.returncode
             }
             
-    except subprocess.TimeoutExpired:
+    except asyncio.TimeoutError:
         return {
             "status": "error", 
             "message": "Analysis timed out after 15 minutes",
-            "timestamp": datetime.now().isoformat()
+            "timestamp": _now_iso()
         }
     except Exception as e:
         return {
             "status": "error", 
             "message": f"Unexpected error: {str(e)}",
-            "timestamp": datetime.now().isoformat()
+            "timestamp": _now_iso()
         }
 
-@app.get("/results")
-async def get_latest_results():
-    """Get the latest analysis results"""
+@app.post("/analyze")
+async def run_analysis():
+    """Run the AI image analysis"""
+    global _current_analysis, _current_analysis_started
+    
+    async with _analysis_lock:
+        if _current_analysis is not None and not _current_analysis.done():
+            return {
+                "status": "already_running",
+                "message": "An analysis is already in progress",
+                "started": _current_analysis_started,
+                "timestamp": _now_iso()
+            }
+        print("Starting analysis...")
+        _current_analysis = asyncio.create_task(_run_analyzer())
+        _current_analysis_started = _now_iso()
+        # Done callbacks run once the task reports done(), so listeners see it finished
+        _current_analysis.add_done_callback(_signal_analysis_change)
+        _signal_analysis_change()
+        task = _current_analysis
+    
+    # Shielded so a client disconnect doesn't cancel the run and orphan the analyzer
+    return await asyncio.shield(task)
+
+# Updated by azure_ai_image_analyzer.py after each run; must match its LATEST_RESULTS_POINTER
+LATEST_RESULTS_POINTER = "image_analysis_results_latest.txt"
+
+def _latest_results_file() -> Optional[str]:
+    """Newest local results file, from the analyzer's pointer file when there is one"""
+    try:
+        with open(LATEST_RESULTS_POINTER, 'r') as f:
+            latest_file = f.read().strip()
+        if os.path.exists(latest_file):
+            return latest_file
+    except FileNotFoundError:
+        pass
+    
+    # Results written before the pointer existed: fall back to scanning. scandir
+    # entries carry their stat, so this is one pass with no extra lookups per file
+    latest_file, latest_ctime = None, -1.0
+    with os.scandir(".") as entries:
+        for entry in entries:
+            name = entry.name
+            if name.startswith("image_analysis_results_") and name.endswith(".json"):
+                ctime = entry.stat().st_ctime
+                if ctime > latest_ctime:
+                    latest_file, latest_ctime = name, ctime
+    return latest_file
+
+def _summarize_results_file(path: str, sample_size: int = 3) -> Dict[str, Any]:
+    """
+    Metadata, statistics and the first few detailed results of a results file
+    
+    The analyzer writes detailed_results last, after the small sections, so each
+    streaming pass stops near the start of the file instead of loading every result.
+    """
+    def first(prefix: str, count: int = 1) -> list:
+        with open(path, 'rb') as f:
+            return list(itertools.islice(ijson.items(f, prefix, use_float=True), count))
+    
+    metadata = (first("analysis_metadata") or [{}])[0]
+    return {
+        "analysis_metadata": metadata,
+        "summary_statistics": (first("summary_statistics") or [{}])[0],
+        "sample_results": first("detailed_results.item", sample_size),
+        # detailed_results has one entry per analyzed image
+        "total_detailed_results": metadata.get("total_images", 0)
+    }
+
+# Summary of the most recently served results file, keyed by its ETag
+_results_cache: Dict[str, Any] = {"etag": None, "summary": None}
+
+async def _latest_results() -> Tuple[Optional[str], Dict[str, Any]]:
+    """ETag and summary of the newest results file; the ETag is None when there is no file to summarize"""
     try:
-        # Look for result files
-        result_files = glob.glob("image_analysis_results_*.json")
+        latest_file = _latest_results_file()
         
-        if result_files:
-            # Get the most recent file
-            latest_file = max(result_files, key=os.path.getctime)
-            
+        if latest_file:
             try:
-                with open(latest_file, 'r') as f:
-                    data = json.load(f)
-                    
-                # Return a summary instead of the full data
-                summary = {
-                    "file": latest_file,
-                    "analysis_metadata": data.get("analysis_metadata", {}),
-                    "summary_statistics": data.get("summary_statistics", {}),
-                    "sample_results": data.get("detailed_results", [])[:3],  # First 3 results
-                    "total_detailed_results": len(data.get("detailed_results", [])),
-                    "file_size_mb": round(os.path.getsize(latest_file) / (1024*1024), 2)
-                }
-                return summary
+                # Results files are written once, so name, mtime and size identify the content
+                stat = os.stat(latest_file)
+                etag = f'W/"{zlib.crc32(latest_file.encode()):x}-{stat.st_mtime_ns:x}-{stat.st_size:x}"'
+                if _results_cache["etag"] != etag:
+                    # Return a summary instead of the full data
+                    _results_cache["summary"] = {
+                        "file": latest_file,
+                        **await asyncio.to_thread(_summarize_results_file, latest_file),
+                        "file_size_mb": round(stat.st_size / (1024*1024), 2)
+                    }
+                    _results_cache["etag"] = etag
+                return etag, _results_cache["summary"]
                 
             except Exception as e:
-                return {
+                return None, {
                     "status": "error", 
                     "message": f"Error reading results file: {str(e)}"
                 }
         else:
-            return {
+            return None, {
                 "status": "no_results", 
                 "message": "No analysis results found. Run an analysis first."
             }
             
     except Exception as e:
-        return {
+        return None, {
             "status": "error", 
             "message": f"Error searching for results: {str(e)}"
         }
 
+@app.get("/results")
+async def get_latest_results(request: Request):
+    """Get the latest analysis results"""
+    etag, summary = await _latest_results()
+    if etag is None:
+        return summary
+    
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if etag in (tag.strip() for tag in request.headers.get("if-none-match", "").split(",")):
+        return Response(status_code=304, headers=headers)
+    return OrjsonResponse(summary, headers=headers)
+
+@app.get("/state")
+async def get_state():
+    """Health, system status and latest results summary in one response"""
+    status, (_, results) = await asyncio.gather(_status(), _latest_results())
+    return {
+        "health": _health(),
+        "status": status,
+        "latest_results": results
+    }
+
+# Static /api/info payload, built once
+API_INFO = {
+    "service": "Azure AI Image Analyzer",
+    "version": "3.0.0",
+    "endpoints": {
+        "/": "Web interface",
+        "/health": "Health check",
+        "/health/stream": "Health updates (server-sent events)",
+        "/status": "System status",
+        "/analyze": "Run analysis (POST)",
+        "/results": "Get latest results",
+        "/state": "Health, status and latest results in one call",
+        "/api/info": "This endpoint"
+    },
+    "description": "Containerized Azure AI Vision image analysis service"
+}
+
 @app.get("/api/info")
 async def get_api_info():
     """Get API information"""
-    return {
-        "service": "Azure AI Image Analyzer",
-        "version": "3.0.0",
-        "endpoints": {
-            "/": "Web interface",
-            "/health": "Health check",
-            "/status": "System status",
-            "/analyze": "Run analysis (POST)",
-            "/results": "Get latest results",
-            "/api/info": "This endpoint"
-        },
-        "description": "Containerized Azure AI Vision image analysis service"
-    }
+    return API_INFO
 
 if __name__ == "__main__":
     port = int(os.getenv("PORT", 8000))
@@ -343,9 +619,11 @@ if __name__ == "__main__":
     print(f"🌐 Server will be available at: http://{host}:{port}")
     print(f"📊 Health check endpoint: http://{host}:{port}/health")
     
+    # Per-request access logging is off by default; set ACCESS_LOG=1 to turn it back on
     uvicorn.run(
         app, 
         host=host, 
         port=port,
-        log_level="info"
+        log_level=os.getenv("LOG_LEVEL", "warning").lower(),
+        access_log=os.getenv("ACCESS_LOG", "").lower() in ("1", "true", "yes")
     )
\ No newline at end of file